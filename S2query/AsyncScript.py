@@ -0,0 +1,73 @@
+import asyncio
+
+from .Scheduler import BadCall, errorText
+
+
+# (Function)
+# - Description:
+#     Import aiohttp only when the async engine is used, so the package
+#     keeps working with just requests installed.
+# - Return:
+#     The aiohttp module.
+#
+def aiohttp():
+  try:
+    import aiohttp as _aiohttp
+  except ImportError as err:
+    raise ImportError("[aget]>> The async engine needs aiohttp, install it with `pip install S2query[async]`.") from err
+  return _aiohttp
+
+
+# (Function)
+# - Description:
+#     Open one aiohttp session with a connection pool sized to the number of
+#     requests in flight, with the headers and timeout of the transport.
+# - Return:
+#     A aiohttp.ClientSession, to be used with `async with`.
+#
+def session(concurrency, transport):
+  http = aiohttp()
+  return http.ClientSession(connector=http.TCPConnector(limit=concurrency),
+                            timeout=http.ClientTimeout(total=transport.timeout),
+                            headers=transport.headers)
+
+
+# (Async generator)
+# - Description:
+#     Run `request(item)` for all the items in the same event loop, with at
+#     most `concurrency` requests in flight. `request` return `[data, item, code]`,
+#     a page that fails waits its own backoff of the scheduler (without holding
+#     a slot) and is tried again, the pages given up are appended to `badcalls`.
+#     The retries and pages given up are kept in `metrics` (when given).
+# - Return:
+#     Yield each result with code 200 as soon as it is done (completion order).
+#
+async def runPages(request, items, concurrency, scheduler, badcalls, fatal=None, metrics=None):
+  semaphore = asyncio.Semaphore(concurrency)
+
+  async def bounded(item):
+    attempt = 1
+    while True:
+      async with semaphore:
+        data, _, code = await request(item)
+      if code == 200:
+        return data, item, code
+      if (fatal is not None and fatal(data, code)) or attempt >= scheduler.retries:
+        badcalls.append(BadCall(item, attempt, code, errorText(data)))
+        if metrics is not None:
+          metrics.badcall(badcalls[-1])
+        return None
+      if metrics is not None:
+        metrics.retry(item, attempt, code)
+      await asyncio.sleep(scheduler.delay(attempt))
+      attempt += 1
+
+  tasks = [asyncio.ensure_future(bounded(item)) for item in items]
+  try:
+    for task in asyncio.as_completed(tasks):
+      result = await task
+      if result is not None:
+        yield result
+  finally:
+    for task in tasks:
+      task.cancel()
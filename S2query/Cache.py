@@ -0,0 +1,314 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+from time import time
+
+
+# (Function)
+# - Description:
+#     The key of a request, the same for requests that are equal after
+#     sorting the params and the keys of the json body.
+# - Return:
+#     A hex str.
+#
+def requestKey(method, url, params=None, body=None):
+  request = [method.upper(), url, sorted((params or {}).items()), body]
+  text = json.dumps(request, sort_keys=True, separators=(",", ":"), default=str)
+  return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# (Function)
+# - Description:
+#     The headers of a response that are still true for the decoded body.
+# - Return:
+#     A dict.
+#
+def plainHeaders(headers):
+  return {k: v for k, v in headers.items() if k.lower() not in ("content-encoding", "content-length", "transfer-encoding")}
+
+
+# (Function)
+# - Description:
+#     Build a requests.Response from a cached entry, so the cached pages are
+#     used as the pages returned by the server.
+# - Return:
+#     A requests.Response.
+#
+def response(code, headers, body):
+  import requests
+  from requests.structures import CaseInsensitiveDict
+
+  res = requests.Response()
+  res.status_code = code
+  res.headers = CaseInsensitiveDict(headers)
+  res._content = body
+  res.encoding = 'utf-8'
+  return res
+
+
+class ResponseCache():
+  """
+  Description
+  ~~~~~~~~~~~~~~~~~~~~~
+    A persistent cache of the responses in a SQLite file, keyed by the normalized
+    request (method, url, params and json body). Each entry expires after its `ttl`,
+    and when the file pass `maxSize` bytes the least recently used entries are removed.
+    Only the responses with success (200) are kept.
+
+    With a process pool the entries are read and written by the processes of the pool,
+    each one with its own connection, and their hits and misses are counted there and
+    are not collected in `.hits`, `.misses` and `.stats()`. Use the "thread" executor
+    or the async engine to have them.
+
+  Parameters
+  ~~~~~~~~~~~~~~~~~~~~~
+
+  `ResponseCache(path = "./S2cache.sqlite", ttl = 86400, maxSize = 512 * 2**20)`:
+    - `path : (str)` |
+          The SQLite file.
+    - `ttl : (float)` |
+          Seconds that a entry is valid, the default is one day.
+    - `maxSize : (int)` |
+          Maximum bytes of the bodies kept, the default is 512MB.
+
+  Example
+  ~~~~~~~~~~~~~~~~~~~~~
+
+   >>> from S2query import S2paperAPI, ResponseCache
+   >>> m = S2paperAPI(cache=ResponseCache("./S2cache.sqlite", ttl=7*86400))
+   >>> m.get("artificial intelligence", n=500)
+   >>> m.get("artificial intelligence", n=500)
+   >>> m.cache.hits, m.cache.misses
+   (5, 5)
+  """
+  def __init__(self, path="./S2cache.sqlite", ttl=86400, maxSize=512 * 2**20):
+    self.path = path
+    self.ttl = ttl
+    self.maxSize = maxSize
+    self.hits = 0
+    self.misses = 0
+    self._lock = threading.Lock()
+    self._db = None
+    self._size = 0
+
+  # Function that return the connection, opening it in the first call.
+  def _connect(self):
+    if self._db is None:
+      folder = os.path.dirname(os.path.abspath(self.path))
+      os.makedirs(folder, exist_ok=True)
+      self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+      self._db.execute("PRAGMA journal_mode=WAL")
+      self._db.execute("""CREATE TABLE IF NOT EXISTS responses (
+                            key TEXT PRIMARY KEY, code INTEGER, headers TEXT, body BLOB,
+                            size INTEGER, expires REAL, accessed REAL)""")
+      self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+      self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    return self._db
+
+  def get(self, key):
+    """
+    Return the entry (code, headers, body) of the key, or None when it is missing or expired.
+    """
+    now = time()
+    with self._lock:
+      db = self._connect()
+      row = db.execute("SELECT code, headers, body, expires, size FROM responses WHERE key = ?", (key,)).fetchone()
+      if row is None or row[3] < now:
+        if row is not None:
+          db.execute("DELETE FROM responses WHERE key = ?", (key,))
+          self._size -= row[4]
+        self.misses += 1
+        return None
+
+      db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+      self.hits += 1
+      return row[0], json.loads(row[1]), row[2]
+
+  def put(self, key, code, headers, body, ttl=None):
+    """
+    Keep a entry for `ttl` seconds (the default is the ttl of the cache).
+    """
+    now = time()
+    ttl = self.ttl if ttl is None else ttl
+    with self._lock:
+      db = self._connect()
+      old = db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+      db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                 (key, code, json.dumps(dict(headers)), body, len(body), now + ttl, now))
+      self._size += len(body) - (0 if old is None else old[0])
+      if self._size > self.maxSize:
+        self._evict(db)
+
+  def delete(self, key):
+    """
+    Remove the entry of the key, a body that can not be parsed.
+    """
+    with self._lock:
+      db = self._connect()
+      row = db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+      if row is not None:
+        db.execute("DELETE FROM responses WHERE key = ?", (key,))
+        self._size -= row[0]
+
+  # Function that remove the expired entries and then the least recently used until maxSize. The
+  # running size of the puts is checked against the file, that other processes may have changed.
+  def _evict(self, db):
+    db.execute("DELETE FROM responses WHERE expires < ?", (time(),))
+    size = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    for key, entry in db.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall():
+      if size <= self.maxSize:
+        break
+      db.execute("DELETE FROM responses WHERE key = ?", (key,))
+      size -= entry
+    self._size = size
+
+  def clear(self):
+    """
+    Remove all the entries.
+    """
+    with self._lock:
+      self._connect().execute("DELETE FROM responses")
+      self._size = 0
+
+  def close(self):
+    with self._lock:
+      if self._db is not None:
+        self._db.close()
+        self._db = None
+
+  def stats(self):
+    """
+    The counters of the cache: hits, misses, entries and bytes kept. The hits and misses
+    are the ones of this process, see the note about the process pool.
+    """
+    with self._lock:
+      entries, size = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+    return {"hits": self.hits, "misses": self.misses, "entries": entries, "size": size}
+
+  # The workers of a process pool open their own connection.
+  def __getstate__(self):
+    state = self.__dict__.copy()
+    del state["_lock"]
+    state["_db"] = None
+    return state
+
+  def __setstate__(self, state):
+    self.__dict__.update(state)
+    self._lock = threading.Lock()
+
+
+# (Function)
+# - Description:
+#     Approximate bytes used by a parsed page, a pandas DataFrame or the
+#     dicts/lists of the web. The object columns of a DataFrame are counted
+#     deeply, pandas counts the lists and dicts of a cell only by their shell.
+# - Return:
+#     A int.
+#
+def sizeOf(value):
+  if hasattr(value, "columns"):
+    size = int(value.index.memory_usage(deep=True))
+    for _, column in value.items():
+      if column.dtype == object:
+        size += int(column.memory_usage(index=False)) + sum(map(sizeOf, column))
+      else:
+        size += int(column.memory_usage(index=False, deep=True))
+    return size
+  if hasattr(value, "memory_usage"):
+    return int(value.memory_usage(index=True, deep=True))
+
+  size = sys.getsizeof(value)
+  if isinstance(value, dict):
+    size += sum(sizeOf(k) + sizeOf(v) for k, v in value.items())
+  elif isinstance(value, (list, tuple)):
+    size += sum(sizeOf(v) for v in value)
+  return size
+
+
+class PageMemo():
+  """
+  Description
+  ~~~~~~~~~~~~~~~~~~~~~
+    A in memory LRU of the parsed pages (the DataFrames of S2paperAPI and the pages of
+    S2paperWeb), keyed by the request of the page. The calls of `.get()` that overlap
+    reuse the pages already parsed, without request or parse them again: with a memo the
+    clients request the full pages aligned on their size and cut them to the window asked,
+    so any `n`/`offset` of the same search finds them. When the pages pass `maxBytes` the
+    least recently used are removed.
+
+    The pages are shared with the results, they must not be changed in place.
+
+  Parameters
+  ~~~~~~~~~~~~~~~~~~~~~
+
+  `PageMemo(maxBytes = 256 * 2**20)`:
+    - `maxBytes : (int)` |
+          Memory budget of the pages kept, the default is 256MB.
+
+  Example
+  ~~~~~~~~~~~~~~~~~~~~~
+
+   >>> from S2query import S2paperAPI, PageMemo
+   >>> m = S2paperAPI(memo=PageMemo(maxBytes=512 * 2**20))
+   >>> m.get("artificial intelligence", n=500)
+   >>> m.get("artificial intelligence", n=300, offset=200)
+   >>> m.memo.hits
+   3
+  """
+  def __init__(self, maxBytes=256 * 2**20):
+    self.maxBytes = maxBytes
+    self.size = 0
+    self.hits = 0
+    self.misses = 0
+    self._pages = OrderedDict()
+    self._lock = threading.Lock()
+
+  def get(self, key):
+    """
+    Return the page of the key, or None.
+    """
+    with self._lock:
+      entry = self._pages.get(key)
+      if entry is None:
+        self.misses += 1
+        return None
+      self._pages.move_to_end(key)
+      self.hits += 1
+      return entry[0]
+
+  def put(self, key, page):
+    """
+    Keep a page, removing the least recently used ones out of the budget.
+    """
+    size = sizeOf(page)
+    if size > self.maxBytes:
+      return
+
+    with self._lock:
+      old = self._pages.pop(key, None)
+      if old is not None:
+        self.size -= old[1]
+      self._pages[key] = (page, size)
+      self.size += size
+      while self.size > self.maxBytes:
+        _, (_, removed) = self._pages.popitem(last=False)
+        self.size -= removed
+
+  def clear(self):
+    with self._lock:
+      self._pages.clear()
+      self.size = 0
+
+  def __len__(self):
+    return len(self._pages)
+
+  # The pages stay in the main process, the workers of a process pool get a empty memo.
+  def __getstate__(self):
+    return {"maxBytes": self.maxBytes}
+
+  def __setstate__(self, state):
+    self.__init__(state["maxBytes"])
@@ -0,0 +1,289 @@
+import json
+import logging
+import os
+from time import perf_counter
+
+from . import Cache
+from . import Executors
+from .Transport import Transport
+from .RateLimiter import RateLimiter, shareProcess, processLimiter
+from .Scheduler import Scheduler
+from .Manifest import Manifest
+from .Metrics import Metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+class S2client():
+  """
+  Description
+  ~~~~~~~~~~~~~~~~~~~~~
+    Base of S2paperAPI and S2paperWeb, it holds the resources shared by
+    all the calls of `.get()` of a instance, like the pool of workers.
+
+    The pool and the HTTP connections are created in the first call and reused until `.close()`,
+    the class can also be used as a context manager:
+
+     >>> with S2paperAPI(executor="thread") as m:
+     ...   m.get("artificial intelligence", n=200)
+     ...   m.get("deep learning", n=200)
+
+    The messages are logged in the logger "S2query" (by default they are not shown, see
+    `logging.basicConfig(level=logging.INFO)`), and the measures of the requests are in `.metrics`.
+  """
+  def __init__(self, poolCPU=4, executor="thread", transport=None, limiter=None, scheduler=None, cache=None, memo=None, rate=10, pause=5, dedup=None, metrics=None):
+    self.poolCPU = poolCPU
+    self.executor = executor
+    self.transport = transport if transport is not None else Transport()
+    """
+    The HTTP layer with the sessions kept alive by each worker.
+    """
+    self.limiter = limiter if limiter is not None else RateLimiter(rate, burst=max(1, int(rate)), pause=pause)
+    """
+    The rate limiter shared by all the workers.
+    """
+    self.scheduler = scheduler if scheduler is not None else Scheduler()
+    """
+    The retry policy of the pages that fail.
+    """
+    self.badcalls = []
+    """
+    The pages not returned by the last search, as a list of BadCall(page, attempts, code, error).
+    """
+    self.cache = cache
+    """
+    The ResponseCache of the responses, None to always go to the network.
+    """
+    self.memo = memo
+    """
+    The PageMemo of the pages already parsed, None to always parse them.
+    """
+    self.dedup = dedup
+    """
+    The PaperIndex of the papers already returned, None to keep the repeated papers.
+    """
+    self.metrics = metrics if metrics is not None else Metrics()
+    """
+    The Metrics of the requests, retries and phases of the instance.
+    """
+    self.manifest = None
+    """
+    The Manifest of the pages of the search saved, at ./saveName.manifest.
+    """
+    self._executor = None
+    self._ownExecutor = False
+
+  # Function that return the pool of workers, creating it in the first call.
+  def _pool(self):
+    if self._executor is None:
+      # Each process of a process pool keeps its share of the limiter, set when the process starts.
+      self._executor, self._ownExecutor = Executors.makeExecutor(self.executor, self.poolCPU, shareProcess,
+                                                                 (self.limiter.key, self.limiter.share(self.poolCPU)))
+    return self._executor
+
+  def close(self):
+    """
+    Shutdown the pool of workers created by the instance and close the
+    sessions of the transport and the cache. An executor passed by the user is not shutdown.
+    """
+    if self._executor is not None and self._ownExecutor:
+      self._executor.shutdown()
+    self._executor = None
+    self.transport.close()
+    if self.cache is not None:
+      self.cache.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  # Function that make a request through the cache, the rate limiter and the transport.
+  def _request(self, method, url, params=None, body=None):
+    key = None
+    if self.cache is not None:
+      key = Cache.requestKey(method, url, params, body)
+      entry = self.cache.get(key)
+      if entry is not None:
+        self.metrics.request(method, entry[0], 0, len(entry[2]), cached=True)
+        return Cache.response(*entry)
+
+    self.limiter.acquire()
+    start = perf_counter()
+    if method == "GET":
+      res = self.transport.get(url, params=params)
+    else:
+      res = self.transport.post(url, json=body, params=params)
+    self.metrics.request(method, res.status_code, perf_counter() - start, len(res.content))
+    self.limiter.update(res.status_code, res.headers.get("Retry-After"))
+
+    if key is not None and res.status_code == 200:
+      self.cache.put(key, res.status_code, Cache.plainHeaders(res.headers), res.content)
+    return res
+
+  # Function that make a request in the worker and return [data, item, code], only the data parsed by
+  # `parse` (or the text of the error) goes back to the main process, never the response.
+  def _fetch(self, item, parse, method, url, params=None, body=None):
+    try:
+      res = self._request(method, url, params=params, body=body)
+    except Exception:
+      return [None, item, 400 ]
+    if res.status_code != 200:
+      return [res.text, item, res.status_code]
+    try:
+      with self.metrics.time("parse"):
+        data = parse(res.content)
+    except Exception:
+      self._uncache(method, url, params, body)
+      raise
+    return [data, item, res.status_code]
+
+  # Function that remove a response from the cache when its body can not be parsed (a truncated 200),
+  # so the next attempt goes to the network again.
+  def _uncache(self, method, url, params=None, body=None):
+    if self.cache is not None:
+      self.cache.delete(Cache.requestKey(method, url, params, body))
+
+  # The async version of _request, return [text, code].
+  async def _arequest(self, session, method, url, params=None, body=None):
+    key = None
+    if self.cache is not None:
+      key = Cache.requestKey(method, url, params, body)
+      entry = self.cache.get(key)
+      if entry is not None:
+        self.metrics.request(method, entry[0], 0, len(entry[2]), cached=True)
+        return [entry[2].decode('utf-8'), entry[0]]
+
+    await self.limiter.aacquire()
+    start = perf_counter()
+    async with session.request(method, url, params=params, json=body) as res:
+      self.limiter.update(res.status, res.headers.get("Retry-After"))
+      content = await res.read()
+    self.metrics.request(method, res.status, perf_counter() - start, len(content))
+
+    if key is not None and res.status == 200:
+      self.cache.put(key, res.status, Cache.plainHeaders(res.headers), content)
+    return [content.decode('utf-8'), res.status]
+
+  # The async version of _fetch, return [data, item, code]: a body that fails to parse is a failed
+  # attempt (with its error as the text), tried again by the scheduler.
+  async def _afetch(self, session, item, parse, method, url, params=None, body=None):
+    try:
+      text, code = await self._arequest(session, method, url, params=params, body=body)
+    except Exception:
+      return [None, item, 400]
+    if code != 200:
+      return [text, item, code]
+    try:
+      with self.metrics.time("parse"):
+        data = parse(text)
+    except Exception as err:
+      self._uncache(method, url, params, body)
+      return [str(err), item, None]
+    return [data, item, code]
+
+  # Function that run `fetch` for the items in the scheduler, with the metrics of the instance.
+  def _schedule(self, pool, fetch, items, workers, badcalls, fatal=None, attempts=None):
+    return self.scheduler.run(pool, fetch, items, workers, badcalls, fatal, attempts, self.metrics)
+
+  # Function that split the pages already parsed in the memo from the ones to request.
+  def _recall(self, pages):
+    hits = {}
+    missing = []
+    for page in pages:
+      data = None if self.memo is None else self.memo.get(self._pageKey(page))
+      if data is None:
+        missing.append(page)
+      else:
+        hits[page] = data
+    return hits, missing
+
+  # Function that keep a parsed page in the memo.
+  def _memoize(self, page, data):
+    if self.memo is not None:
+      self.memo.put(self._pageKey(page), data)
+
+  # Function that open the manifest of a search saved, where the status of each page is kept.
+  def _openManifest(self, resume):
+    self._closeManifest()
+    self._resume = resume
+    self._cleared = set()
+    if not self.saveFile:
+      if resume:
+        raise ValueError("[resume]>> resume=True needs save=True, the manifest is kept with the saved file.")
+      return
+    self.manifest = Manifest(os.path.join(os.getcwd(), f'{self.saveName}.manifest'))
+
+  def _closeManifest(self):
+    if self.manifest is not None:
+      self.manifest.close()
+      self.manifest = None
+
+  # Function that return the pages of the current job that are not done in the manifest.
+  def _pending(self, pages):
+    if self.manifest is None:
+      return pages
+    job = self._jobKey()
+    # A new search clears the pages of the job once, the next batches of the same search are kept.
+    if not self._resume and job not in self._cleared:
+      self.manifest.clear(job)
+      self._cleared.add(job)
+    pending = self.manifest.pending(job, pages)
+    if len(pending) != len(pages):
+      logger.info(f"[resume]>> {len(pages) - len(pending)} pages already done.")
+    return pending
+
+  # Function that tells if a page of the current job is already done in the manifest of a search resumed.
+  def _done(self, page):
+    return self.manifest is not None and self._resume and len(self.manifest.pending(self._jobKey(), [page])) == 0
+
+  # Function that set the status of pages of the current job (or of the job given) in the manifest.
+  def _mark(self, pages, status, attempts={}, location=None, job=None):
+    if self.manifest is not None:
+      self.manifest.mark(self._jobKey() if job is None else job, pages, status, attempts, location)
+
+  # Function that mark as done the pages collected by the async engine, once they are written in the file.
+  def _markWritten(self, location):
+    jobs = {}
+    for job, page in self._written:
+      jobs.setdefault(job, []).append(page)
+    for job, pages in jobs.items():
+      self._mark(pages, "done", location=location, job=job)
+
+  # Function that save the bad calls in ./BadCalls.text when the search is saved.
+  def _saveBadcalls(self, badcalls):
+    if len(badcalls) == 0:
+      return
+
+    self._mark([bad.page for bad in badcalls], "failed", {bad.page: bad.attempts for bad in badcalls})
+    self.badcalls.extend(badcalls)
+    logger.warning(f"[badcalls]>> Bad call of pages: {badcalls}")
+    if self.saveFile:
+      try:
+        with open("./BadCalls.text", 'w', encoding='UTF-8') as fp:
+          json.dump([bad._asdict() for bad in self.badcalls], fp)
+      except Exception:
+        logger.exception("[badcalls]>> Fail to save badcalls.")
+
+  # The state sent to the workers of a process pool, without the pool, the results and the indexes of
+  # papers seen (only used in the main process, a bloom filter is allocated again at each unpickle).
+  def __getstate__(self):
+    from concurrent.futures import ProcessPoolExecutor
+
+    state = self.__dict__.copy()
+    for key in ("all", "papers_text", "_writer", "manifest", "edges", "nodes", "dedup", "visited"):
+      state.pop(key, None)
+    # The tasks take the limiter of their process, only a pool given by the user (without the
+    # initializer) receives the share, kept by the process in its first task.
+    if isinstance(self._executor, ProcessPoolExecutor):
+      state["limiter"] = (self.limiter.key, None if self._ownExecutor else self.limiter.share(self.poolCPU))
+    state["_executor"] = None
+    state["executor"] = None
+    return state
+
+  def __setstate__(self, state):
+    if isinstance(state["limiter"], tuple):
+      state["limiter"] = processLimiter(*state["limiter"])
+    self.__dict__.update(state)
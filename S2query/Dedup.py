@@ -0,0 +1,148 @@
+import hashlib
+import math
+import threading
+
+
+# (Function)
+# - Description:
+#     A hash of 16 bytes of a id, read as two integers of 64 bits.
+# - Return:
+#     A tuple (int, int).
+#
+def idHash(key):
+  digest = hashlib.blake2b(str(key).encode("utf-8"), digest_size=16).digest()
+  return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little")
+
+
+class PaperIndex():
+  """
+  Description
+  ~~~~~~~~~~~~~~~~~~~~~
+    A index of the papers already returned, keyed by `paperId` (S2paperAPI) or `id`
+    (S2paperWeb). The pages that overlap (the ranking changes in the middle of a search)
+    and the searches that return the same papers keep only the first copy of each paper,
+    in `.all` and in the files saved. The index is kept by the instance across the calls
+    of `.get()`, until `.clear()`.
+
+    By default the ids are kept as hashes of 64 bits in a set. With `bloom=True` a Bloom
+    filter of fixed size is used instead, for very large searches: the memory does not grow
+    with the papers, but a fraction `errorRate` of the new papers can be taken as repeated.
+
+  Parameters
+  ~~~~~~~~~~~~~~~~~~~~~
+
+  `PaperIndex(bloom = False, capacity = 10**7, errorRate = 0.001)`:
+    - `bloom : (bool)` |
+          If true, use a Bloom filter.
+    - `capacity : (int)` |
+          Papers expected in the Bloom filter, the filter has about 1.8MB by million of papers
+          with the default errorRate.
+    - `errorRate : (float)` |
+          Fraction of new papers taken as repeated by the Bloom filter at its capacity.
+
+  Example
+  ~~~~~~~~~~~~~~~~~~~~~
+
+   >>> from S2query import S2paperAPI, PaperIndex
+   >>> m = S2paperAPI(dedup=PaperIndex())
+   >>> m.get("artificial intelligence", n=500)
+   >>> m.get("machine learning", n=500)
+   >>> m.dedup.stats()
+   {'seen': 1000, 'duplicates': 87, 'rate': 0.087, 'size': 913}
+  """
+  def __init__(self, bloom=False, capacity=10**7, errorRate=0.001):
+    self.bloom = bloom
+    self.capacity = capacity
+    self.errorRate = errorRate
+    self.seen = 0
+    self.duplicates = 0
+    self._lock = threading.Lock()
+    self._new()
+
+  # Function that create the empty set or Bloom filter.
+  def _new(self):
+    self._size = 0
+    if self.bloom:
+      self._bits = max(8, int(-self.capacity * math.log(self.errorRate) / math.log(2)**2))
+      self._hashes = max(1, round(self._bits / self.capacity * math.log(2)))
+      self._filter = bytearray((self._bits + 7)//8)
+    else:
+      self._set = set()
+
+  # Function that add a id, return True when it was not in the index.
+  def _add(self, key):
+    first, second = idHash(key)
+    if not self.bloom:
+      if first in self._set:
+        return False
+      self._set.add(first)
+      self._size += 1
+      return True
+
+    new = False
+    for i in range(self._hashes):
+      bit = (first + i * second) % self._bits
+      if not self._filter[bit >> 3] & (1 << (bit & 7)):
+        self._filter[bit >> 3] |= 1 << (bit & 7)
+        new = True
+    self._size += new
+    return new
+
+  def add(self, key):
+    """
+    Add a id, return True when the paper is new.
+    """
+    return self.unique([key])[0]
+
+  def unique(self, keys):
+    """
+    Add the ids of a page, return a list of bool that is True for the papers that are new
+    (the first copy of the ids repeated in the page). The papers without id are kept.
+    """
+    mask = []
+    with self._lock:
+      for key in keys:
+        if key is None or key != key:
+          mask.append(True)
+          continue
+        new = self._add(key)
+        self.seen += 1
+        self.duplicates += not new
+        mask.append(new)
+    return mask
+
+  def __contains__(self, key):
+    first, second = idHash(key)
+    if not self.bloom:
+      return first in self._set
+    return all(self._filter[bit >> 3] & (1 << (bit & 7))
+               for bit in ((first + i * second) % self._bits for i in range(self._hashes)))
+
+  def __len__(self):
+    return self._size
+
+  @property
+  def rate(self):
+    """
+    The fraction of the papers returned that were repeated.
+    """
+    return self.duplicates / self.seen if self.seen != 0 else 0.0
+
+  def stats(self):
+    """
+    The counters of the index: papers seen, duplicates, the rate of duplicates and the papers kept.
+    """
+    return {"seen": self.seen, "duplicates": self.duplicates, "rate": round(self.rate, 4), "size": self._size}
+
+  def clear(self):
+    with self._lock:
+      self.seen = 0
+      self.duplicates = 0
+      self._new()
+
+  # The index stays in the main process, the workers of a process pool get a empty index.
+  def __getstate__(self):
+    return {"bloom": self.bloom, "capacity": self.capacity, "errorRate": self.errorRate}
+
+  def __setstate__(self, state):
+    self.__init__(**state)
@@ -0,0 +1,60 @@
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+
+
+class SerialExecutor(Executor):
+  """
+  Description
+  ~~~~~~~~~~~~~~~~~~~~~
+    A concurrent.futures Executor that run each call in the caller thread,
+    useful to debug or when the work is too small to pay for a pool.
+  """
+  def submit(self, fn, *args, **kwargs):
+    future = Future()
+    try:
+      future.set_result(fn(*args, **kwargs))
+    except BaseException as err:
+      future.set_exception(err)
+    return future
+
+
+# (Function)
+# - Description:
+#     Create a pool of processes, importing multiprocessing only when it is used.
+# - Return:
+#     A ProcessPoolExecutor, each process runs `initializer(*initargs)` when it starts.
+#
+def processPool(workers, initializer=None, initargs=()):
+  from concurrent.futures import ProcessPoolExecutor
+
+  return ProcessPoolExecutor(workers, initializer=initializer, initargs=initargs)
+
+
+EXECUTORS = {
+  "thread": ThreadPoolExecutor,
+  "process": processPool,
+  "serial": lambda workers: SerialExecutor(),
+}
+
+
+# (Function)
+# - Description:
+#     Create the executor used by the classes to make the requests and
+#     extract the data.
+# - Parameters:
+#     executor: "thread", "process", "serial" or a concurrent.futures.Executor.
+#     workers: Number of workers of the pool.
+#     initializer, initargs: Run in each process of a process pool when it starts.
+# - Return:
+#     A tuple (Executor, owned), owned is False when the executor was given by
+#     the user and so must not be shutdown by the classes.
+#
+def makeExecutor(executor, workers, initializer=None, initargs=()):
+  if isinstance(executor, Executor):
+    return executor, False
+
+  if executor not in EXECUTORS:
+    raise ValueError(f"[executor]>> Unknown executor {executor!r}, the options are {list(EXECUTORS)} or a concurrent.futures.Executor.")
+
+  if executor == "process":
+    return processPool(workers, initializer, initargs), True
+  return EXECUTORS[executor](workers), True
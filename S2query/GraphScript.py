@@ -0,0 +1,251 @@
+import logging
+import os
+import re
+from collections import namedtuple
+
+from . import Json
+from . import Storage
+from .Client import S2client
+from .Dedup import PaperIndex
+from .Metrics import timer
+from .SearchScript import paperId
+
+
+logger = logging.getLogger(__name__)
+
+
+Edge = namedtuple("Edge", ["citing", "cited", "depth"])
+Edge.__doc__ = """
+A citation of the graph: the paper `citing` cites the paper `cited`, found when the nodes at `depth - 1` were expanded.
+"""
+
+# The ids of Semantic Scholar, the other ids of the seeds are resolved to them before the crawl.
+PAPER_ID = re.compile(r"[0-9a-fA-F]{40}")
+
+
+class S2paperGraph(S2client):
+  """
+  Description
+  ~~~~~~~~~~~~~~~~~~~~~
+    Class that crawls the graph of citations of the Semantic Scholar API, expanding the
+    references (`/paper/{id}/references`) and the citations (`/paper/{id}/citations`)
+    of the papers breadth first from some seeds. The papers of a level are requested at
+    the same time, with the pool, rate limiter and retries of S2paperAPI, and the edges are
+    given (or saved) as they arrive, so only the hashes of the papers visited and of the
+    edges found are kept in memory.
+
+  Parameters
+  ~~~~~~~~~~~~~~~~~~~~~
+
+  `S2paperGraph(poolCPU = 4, sleeptry = 5, executor = "thread", transport = None, limiter = None, scheduler = None, cache = None, metrics = None)`:
+    The same of `S2paperAPI()`.
+
+  Example
+  ~~~~~~~~~~~~~~~~~~~~~
+
+   >>> from S2query import S2paperGraph
+   >>> m = S2paperGraph(poolCPU=8)
+   >>> m.crawl(["649def34f8be52c8b66281af98ae884c09aef38b"], depth=2, maxNodes=5000)
+   >>> m.edges.head(2)
+                                        citing                                     cited  depth
+   0  649def34f8be52c8b66281af98ae884c09aef38b  0b3cfbf79d50dd4ee56c0a9f9a0d8ae8ed3af7e7      1
+   1  649def34f8be52c8b66281af98ae884c09aef38b  2e9d221c206e9503ceb452302d68d10e293f2a10      1
+  """
+  def __init__(self, poolCPU=4, sleeptry=5, executor="thread", transport=None, limiter=None, scheduler=None, cache=None, metrics=None):
+    super().__init__(poolCPU, executor, transport, limiter, scheduler, cache, rate=10, pause=sleeptry, metrics=metrics)
+    self._api = "https://api.semanticscholar.org/graph/v1/paper"
+    self._batchApi = "https://api.semanticscholar.org/graph/v1/paper/batch"
+    self._fields = "paperId"
+    self._limit = 1000
+    self._maxNeighbors = 1000
+    self.saveFile = False
+    self.visited = PaperIndex()
+    """
+    The index of the papers visited by the last crawl.
+    """
+
+  # The main Function to crawl the graph.
+  @timer
+  def crawl(self, seeds, direction="both", depth=1, maxNodes=10000, maxNeighbors=1000, fields=["title", "year"], save=False, **kwargs):
+    """
+    .crawl()
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    `S2paperGraph().crawl(seeds, direction = "both", depth = 1, maxNodes = 10000, maxNeighbors = 1000, fields = ["title", "year"], save = False, saveName = Graph)`
+
+    Parameters
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    - `seeds : list(str)` |
+          The papers where the crawl starts, paperIds or the ids of `S2paperAPI().get_by_ids()`. The other ids
+          are resolved to their paperIds in one batch request, the seeds not found are skipped.
+    - `direction : (str)` |
+          The edges expanded, "references", "citations" or "both". The default is "both".
+    - `depth : (int)` |
+          The levels expanded from the seeds. The default is 1, only the neighbors of the seeds.
+    - `maxNodes : (int)` |
+          Maximum papers of the graph, the new papers found after it are not added (nor their edges).
+    - `maxNeighbors : (int)` |
+          Maximum references and citations requested of each paper, by direction.
+    - `fields : list(str)` |
+          The columns of the papers found, the same of `S2paperAPI().get()`.
+    - `save : (bool)` |
+          If true, the edges and the papers are appended to ./saveName.edges.csv and ./saveName.nodes.csv
+          as they arrive, and not kept in memory.
+    - `saveName : (str)` |
+          The name of the files when the save is set True. The default is "Graph".
+
+    Returns
+    ~~~~~~~~~~~~~~~~~~~~~
+
+        When the parameter (save) is False, the edges in (.edges) and the papers found in (.nodes), as
+        pandas DataFrames. The requests given up are in (.badcalls).
+    """
+    import pandas as pd
+    self.saveName = kwargs.get('saveName', "Graph")
+    self.saveFile = save
+    self.edges = None
+    """
+    The edges of the graph, a pandas DataFrame (citing, cited, depth).
+    """
+    self.nodes = None
+    """
+    The papers found, a pandas DataFrame with the fields and the depth where they were found.
+    """
+    edges, nodes = [], []
+    edgeWriter = nodeWriter = None
+    if self.saveFile:
+      edgeWriter = Storage.TableWriter(os.path.join(os.getcwd(), f'{self.saveName}.edges.csv'))
+      nodeWriter = Storage.TableWriter(os.path.join(os.getcwd(), f'{self.saveName}.nodes.csv'))
+
+    try:
+      for edge, node in self._crawl(seeds, direction, depth, maxNodes, maxNeighbors, fields):
+        if edge is not None:
+          edges.append(edge)
+        if node is not None:
+          nodes.append(node)
+        if self.saveFile and len(edges) >= 10000:
+          self._saveGraph(edgeWriter, nodeWriter, edges, nodes)
+          edges, nodes = [], []
+      if self.saveFile:
+        self._saveGraph(edgeWriter, nodeWriter, edges, nodes)
+    finally:
+      for writer in (edgeWriter, nodeWriter):
+        if writer is not None:
+          writer.close()
+          logger.info(f"[Save]>> Saved in {writer.path}")
+
+    if not self.saveFile:
+      self.edges = pd.DataFrame(edges, columns=Edge._fields)
+      self.nodes = pd.DataFrame(nodes)
+
+  # Iterator over the edges of the graph, as they arrive.
+  def iter_edges(self, seeds, direction="both", depth=1, maxNodes=10000, maxNeighbors=1000):
+    """
+    .iter_edges()
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    `for edge in S2paperGraph().iter_edges(seeds, direction = "both", depth = 1, maxNodes = 10000, maxNeighbors = 1000)`
+
+    Yield each edge as a `Edge(citing, cited, depth)` as soon as it is found, the parameters are the
+    same of `.crawl()`. The responses are not kept, only the hashes of the papers and edges found.
+
+     >>> m = S2paperGraph()
+     >>> with open("edges.csv", "w") as fp:
+     ...   for edge in m.iter_edges(["649def34f8be52c8b66281af98ae884c09aef38b"], depth=3, maxNodes=100000):
+     ...     fp.write(f"{edge.citing},{edge.cited}\\n")
+    """
+    for edge, _ in self._crawl(seeds, direction, depth, maxNodes, maxNeighbors, []):
+      if edge is not None:
+        yield edge
+
+# The crawl breadth first, yield (edge, node) with the node of the new papers found (or None).
+  def _crawl(self, seeds, direction, depth, maxNodes, maxNeighbors, fields):
+    if direction not in ("references", "citations", "both"):
+      raise ValueError(f"[crawl]>> Unknown direction {direction!r}, the options are 'references', 'citations' or 'both'.")
+    kinds = ["references", "citations"] if direction == "both" else [direction]
+
+    self.badcalls = []
+    self.visited = PaperIndex()
+    self._fields = ",".join(["paperId"] + [field for field in fields if field != "paperId"])
+    self._limit = max(1, min(maxNeighbors, 1000))
+    self._maxNeighbors = maxNeighbors
+    found = PaperIndex()
+
+    frontier = [seed for seed, new in zip(*self._seeds(seeds)) if new]
+    pool = self._pool()
+    for level in range(1, depth + 1):
+      logger.info(f"[_crawl]>> Level {level}, expanding {len(frontier)} papers...")
+      following = []
+      items = [(node, kind, 0) for node in frontier for kind in kinds]
+      while len(items) != 0:
+        badcalls = []
+        more = []
+        for data, (node, kind, offset), _ in self._schedule(pool, self._queryEdges, items, self.poolCPU, badcalls, self._fatal):
+          if data["next"] is not None and data["next"] < maxNeighbors:
+            more.append((node, kind, data["next"]))
+
+          for paper in data["papers"]:
+            other = paper.get("paperId")
+            if other is None:
+              continue
+            new = other not in self.visited
+            if new:
+              if len(self.visited) >= maxNodes:
+                continue
+              self.visited.add(other)
+              following.append(other)
+
+            edge = Edge(node, other, level) if kind == "references" else Edge(other, node, level)
+            if found.add(f"{edge.citing}>{edge.cited}"):
+              yield edge, dict(paper, depth=level) if new else None
+            elif new:
+              yield None, dict(paper, depth=level)
+        self._saveBadcalls(badcalls)
+        items = more
+      frontier = following
+
+# Function that resolve the seeds to their paperIds and add them to the visited papers, so a seed given
+# by its DOI or arXiv id is the same node when it is found again as a neighbor.
+  def _seeds(self, seeds):
+    seeds = [paperId(seed) for seed in seeds]
+    ids = list(dict.fromkeys(seed for seed in seeds if not PAPER_ID.fullmatch(seed)))
+    resolved = {}
+    if len(ids) != 0:
+      badcalls = []
+      batches = [tuple(ids[start:start + 500]) for start in range(0, len(ids), 500)]
+      for data, batch, _ in self._schedule(self._pool(), self._queryIds, batches, self.poolCPU, badcalls):
+        resolved.update((id, paper["paperId"]) for id, paper in zip(batch, data) if paper is not None and paper.get("paperId"))
+      self._saveBadcalls(badcalls)
+      missing = [id for id in ids if id not in resolved]
+      if len(missing) != 0:
+        logger.warning(f"[_seeds]>> Seeds not found, they are not crawled: {missing}")
+    seeds = [resolved.get(seed, seed) for seed in seeds if PAPER_ID.fullmatch(seed) or seed in resolved]
+    return seeds, self.visited.unique(seeds)
+
+# Function that request the paperIds of a batch of ids.
+  def _queryIds(self, batch):
+    return self._fetch(batch, Json.loads, "POST", self._batchApi, params={"fields": "paperId"}, body={"ids": list(batch)})
+
+# Function that append the edges and the papers of a check point to the files.
+  def _saveGraph(self, edgeWriter, nodeWriter, edges, nodes):
+    import pandas as pd
+    with self.metrics.time("save"):
+      edgeWriter.write(pd.DataFrame(edges, columns=Edge._fields))
+      nodeWriter.write(pd.DataFrame(nodes))
+
+# Function that tells the errors that are not solved trying again, the papers not found.
+  def _fatal(self, res, code):
+    return code == 404
+
+# Function that request a page of the references or citations of a paper.
+  def _queryEdges(self, item):
+    node, kind, offset = item
+    params = {"fields": self._fields, "offset": offset, "limit": min(self._limit, self._maxNeighbors - offset)}
+    return self._fetch(item, self._parseEdges, "GET", f"{self._api}/{node}/{kind}", params=params)
+
+# Function that treat the body of a page of edges, called in the worker: only the papers of the other end are kept.
+  def _parseEdges(self, text):
+    data = Json.loads(text)
+    papers = [row.get("citedPaper") or row.get("citingPaper") or {} for row in data.get("data") or []]
+    return {"next": data.get("next"), "papers": papers}
@@ -0,0 +1,45 @@
+import json
+
+try:
+  import orjson
+except ImportError:
+  orjson = None
+
+
+# (Function)
+# - Description:
+#     Parse a JSON text or the bytes of a response, with orjson when it is
+#     installed (`pip install S2query[fast]`) and the json module if not.
+# - Return:
+#     The parsed value.
+#
+def loads(data):
+  if orjson is not None:
+    return orjson.loads(data)
+  return json.loads(data)
+
+
+# (Function)
+# - Description:
+#     Write a value as a JSON text of one line, without escape the unicode.
+#     The values that orjson does not know are written by the json module.
+# - Return:
+#     A str.
+#
+def dumps(value):
+  if orjson is not None:
+    try:
+      return orjson.dumps(value).decode("utf-8")
+    except TypeError:
+      pass
+  return json.dumps(value, ensure_ascii=False)
+
+
+# (Function)
+# - Description:
+#     The name of the backend in use.
+# - Return:
+#     "orjson" or "json".
+#
+def backend():
+  return "json" if orjson is None else "orjson"
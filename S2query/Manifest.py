@@ -0,0 +1,87 @@
+import sqlite3
+import threading
+from time import time
+
+
+class Manifest():
+  """
+  Description
+  ~~~~~~~~~~~~~~~~~~~~~
+    The record of a harvest saved in a SQLite file: the status ("pending", "done" or
+    "failed"), the attempts and the output file of each page (or offset) of a job. A job
+    is a search with its fixed parameters, so a killed harvest can restart with
+    `.get(..., save=True, resume=True)` requesting only the pages missing or failed.
+
+  Parameters
+  ~~~~~~~~~~~~~~~~~~~~~
+
+  `Manifest(path)`:
+    - `path : (str)` |
+          The SQLite file, `./saveName.manifest` when created by `.get()`.
+
+  Example
+  ~~~~~~~~~~~~~~~~~~~~~
+
+   >>> from S2query import Manifest
+   >>> Manifest("./Data.manifest").summary()
+   {'done': 97, 'failed': 3}
+  """
+  def __init__(self, path):
+    self.path = path
+    self._lock = threading.Lock()
+    self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+    self._db.execute("PRAGMA journal_mode=WAL")
+    self._db.execute("""CREATE TABLE IF NOT EXISTS pages (
+                          job TEXT, page TEXT, status TEXT, attempts INTEGER, location TEXT, updated REAL,
+                          PRIMARY KEY (job, page))""")
+
+  def clear(self, job):
+    """
+    Forget the pages of a job.
+    """
+    with self._lock:
+      self._db.execute("DELETE FROM pages WHERE job = ?", (job,))
+
+  def pending(self, job, pages):
+    """
+    Add the pages to the job and return the ones that are not done.
+    """
+    now = time()
+    with self._lock:
+      self._db.executemany("INSERT OR IGNORE INTO pages VALUES (?, ?, 'pending', 0, NULL, ?)",
+                           [(job, str(page), now) for page in pages])
+      done = {row[0] for row in self._db.execute("SELECT page FROM pages WHERE job = ? AND status = 'done'", (job,))}
+    return [page for page in pages if str(page) not in done]
+
+  def mark(self, job, pages, status, attempts={}, location=None):
+    """
+    Set the status of the pages, with their attempts (a dict by page) and output file.
+    """
+    now = time()
+    with self._lock:
+      self._db.executemany("""UPDATE pages SET status = ?, attempts = attempts + ?, location = COALESCE(?, location),
+                              updated = ? WHERE job = ? AND page = ?""",
+                           [(status, attempts.get(page, 1), location, now, job, str(page)) for page in pages])
+
+  def status(self, job=None):
+    """
+    The pages of a job (or of all the jobs) as a list of dictionaries.
+    """
+    query = "SELECT job, page, status, attempts, location, updated FROM pages"
+    with self._lock:
+      rows = self._db.execute(query + " WHERE job = ?", (job,)) if job else self._db.execute(query)
+      keys = ["job", "page", "status", "attempts", "location", "updated"]
+      return [dict(zip(keys, row)) for row in rows]
+
+  def summary(self, job=None):
+    """
+    The number of pages by status.
+    """
+    summary = {}
+    for row in self.status(job):
+      summary[row["status"]] = summary.get(row["status"], 0) + 1
+    return summary
+
+  def close(self):
+    with self._lock:
+      self._db.close()
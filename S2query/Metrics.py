@@ -0,0 +1,250 @@
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from time import perf_counter
+
+
+logger = logging.getLogger(__name__)
+
+# The buckets in seconds of the histograms of latency and of the phases.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class Histogram():
+  """
+  Description
+  ~~~~~~~~~~~~~~~~~~~~~
+    A histogram of fixed buckets, each observation costs a binary search and two sums.
+  """
+  __slots__ = ("buckets", "counts", "count", "sum")
+
+  def __init__(self, buckets=BUCKETS):
+    self.buckets = buckets
+    self.counts = [0] * (len(buckets) + 1)
+    self.count = 0
+    self.sum = 0.0
+
+  def observe(self, value):
+    self.counts[bisect_left(self.buckets, value)] += 1
+    self.count += 1
+    self.sum += value
+
+  def quantile(self, q):
+    """
+    The upper bound of the bucket of the quantile `q` (0 to 1), or None without observations.
+    """
+    if self.count == 0:
+      return None
+    rank = q * self.count
+    seen = 0
+    for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+      seen += count
+      if seen >= rank:
+        return bound
+    return float("inf")
+
+  def snapshot(self):
+    return {"count": self.count, "sum": round(self.sum, 6),
+            "buckets": {str(bound): count for bound, count in zip(self.buckets + ("+Inf",), self.counts)},
+            "p50": self.quantile(0.5), "p99": self.quantile(0.99)}
+
+
+class Metrics():
+  """
+  Description
+  ~~~~~~~~~~~~~~~~~~~~~
+    The measures of a instance, collected all the time: the latency of the requests, the
+    bytes received, the status codes, the responses of the cache, the retries and pages
+    given up, the pages waiting and running in the scheduler, and the time of each phase
+    (parse, save, `get`, `_runtime`...).
+
+    The listeners added with `.subscribe(callback)` are called as `callback(event, data)`
+    at each event ("request", "retry", "badcall" and "phase"). The measures can be read
+    as a dictionary (`.snapshot()`) or in the text format of Prometheus (`.prometheus()`).
+
+    With a process pool the requests and the parses are measured in the processes of the
+    pool and are not collected, use the "thread" executor or the async engine to have them.
+
+  Example
+  ~~~~~~~~~~~~~~~~~~~~~
+
+   >>> m = S2paperAPI()
+   >>> m.metrics.subscribe(lambda event, data: event == "retry" and print(data))
+   >>> m.get("artificial intelligence", n=500)
+   >>> m.metrics.snapshot()["status"]
+   {'200': 5}
+   >>> print(m.metrics.prometheus())
+  """
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._listeners = []
+    self.reset()
+
+  def reset(self):
+    """
+    Clear all the measures, the listeners are kept.
+    """
+    with self._lock:
+      self.requests = 0
+      self.bytes = 0
+      self.status = {}
+      self.cacheHits = 0
+      self.retries = 0
+      self.badcalls = 0
+      self.waiting = 0
+      self.running = 0
+      self.latency = Histogram()
+      self.phases = {}
+
+  def subscribe(self, callback):
+    """
+    Add a listener, called as `callback(event, data)` at each event.
+    """
+    self._listeners.append(callback)
+    return callback
+
+  def unsubscribe(self, callback):
+    self._listeners.remove(callback)
+
+  def _emit(self, event, data):
+    for callback in self._listeners:
+      try:
+        callback(event, data)
+      except Exception:
+        logger.exception("[Metrics]>> The listener %r failed.", callback)
+
+  def request(self, method, code, seconds, size, cached=False):
+    """
+    Measure a response: the status code, the seconds and the bytes received.
+    """
+    with self._lock:
+      self.requests += 1
+      self.bytes += size
+      self.status[code] = self.status.get(code, 0) + 1
+      if cached:
+        self.cacheHits += 1
+      else:
+        self.latency.observe(seconds)
+    if self._listeners:
+      self._emit("request", {"method": method, "code": code, "seconds": seconds, "bytes": size, "cached": cached})
+
+  def retry(self, item, attempt, code):
+    """
+    Count a page that failed and goes back to the queue.
+    """
+    with self._lock:
+      self.retries += 1
+    if self._listeners:
+      self._emit("retry", {"item": item, "attempt": attempt, "code": code})
+
+  def badcall(self, bad):
+    """
+    Count a page given up.
+    """
+    with self._lock:
+      self.badcalls += 1
+    if self._listeners:
+      self._emit("badcall", bad._asdict())
+
+  def queue(self, waiting, running):
+    """
+    Keep the pages waiting and running in the scheduler.
+    """
+    self.waiting = waiting
+    self.running = running
+
+  def phase(self, name, seconds):
+    """
+    Measure the seconds of a phase.
+    """
+    with self._lock:
+      histogram = self.phases.get(name)
+      if histogram is None:
+        histogram = self.phases[name] = Histogram()
+      histogram.observe(seconds)
+    if self._listeners:
+      self._emit("phase", {"phase": name, "seconds": seconds})
+
+  @contextmanager
+  def time(self, name):
+    """
+    Measure the block of a `with` as the phase `name`.
+    """
+    start = perf_counter()
+    try:
+      yield
+    finally:
+      self.phase(name, perf_counter() - start)
+
+  def snapshot(self):
+    """
+    The measures as a dictionary, ready to be written as JSON.
+    """
+    with self._lock:
+      return {"requests": self.requests, "bytes": self.bytes,
+              "status": {str(code): count for code, count in self.status.items()},
+              "cacheHits": self.cacheHits, "retries": self.retries, "badcalls": self.badcalls,
+              "queue": {"waiting": self.waiting, "running": self.running},
+              "latency": self.latency.snapshot(),
+              "phases": {name: histogram.snapshot() for name, histogram in self.phases.items()}}
+
+  def prometheus(self, prefix="s2query"):
+    """
+    The measures in the text format of Prometheus.
+    """
+    data = self.snapshot()
+    lines = [f"# TYPE {prefix}_requests_total counter"]
+    lines += [f'{prefix}_requests_total{{status="{code}"}} {count}' for code, count in data["status"].items()]
+    for name, key in (("bytes_received_total", "bytes"), ("cache_hits_total", "cacheHits"),
+                      ("retries_total", "retries"), ("badcalls_total", "badcalls")):
+      lines += [f"# TYPE {prefix}_{name} counter", f"{prefix}_{name} {data[key]}"]
+    lines += [f"# TYPE {prefix}_queue_pages gauge",
+              f'{prefix}_queue_pages{{state="waiting"}} {data["queue"]["waiting"]}',
+              f'{prefix}_queue_pages{{state="running"}} {data["queue"]["running"]}']
+
+    def histogram(name, snapshot, labels=""):
+      total = 0
+      rows = []
+      for bound, count in snapshot["buckets"].items():
+        total += count
+        rows.append(f'{prefix}_{name}_bucket{{{labels}le="{bound}"}} {total}')
+      rows.append(f"{prefix}_{name}_sum{{{labels.rstrip(',')}}} {snapshot['sum']}")
+      rows.append(f"{prefix}_{name}_count{{{labels.rstrip(',')}}} {snapshot['count']}")
+      return rows
+
+    lines += [f"# TYPE {prefix}_request_seconds histogram"] + histogram("request_seconds", data["latency"])
+    lines.append(f"# TYPE {prefix}_phase_seconds histogram")
+    for name, snapshot in data["phases"].items():
+      lines += histogram("phase_seconds", snapshot, f'phase="{name}",')
+    return "\n".join(lines) + "\n"
+
+  # The workers of a process pool get empty metrics, without the listeners.
+  def __getstate__(self):
+    return {}
+
+  def __setstate__(self, state):
+    self.__init__()
+
+
+# (Decorantor)
+# - Description:
+#     Function that times the execution of the methods of a instance, the seconds
+#     are kept in the phases of its metrics and logged in the level DEBUG.
+# - Return:
+#     The result of the method.
+#
+def timer(fun):
+  def warper(*args, **kwargs):
+    start = perf_counter()
+    try:
+      return fun(*args, **kwargs)
+    finally:
+      seconds = perf_counter() - start
+      metrics = getattr(args[0], "metrics", None) if len(args) != 0 else None
+      if metrics is not None:
+        metrics.phase(fun.__name__, seconds)
+      logger.debug("[%s]>> Took %.2fs", fun.__name__, seconds)
+  warper.__name__ = fun.__name__
+  warper.__doc__ = fun.__doc__
+  return warper
@@ -0,0 +1,164 @@
+import os
+import threading
+from time import monotonic, sleep, time
+
+# The limiter of each process of a process pool, by the key of the limiter of the main process.
+_processLimiters = {}
+
+
+# (Function)
+# - Description:
+#     Read the header Retry-After, that can be in seconds or a http date.
+# - Return:
+#     The seconds to wait, or None.
+#
+def retryAfter(value):
+  if value is None:
+    return None
+  try:
+    return max(0.0, float(value))
+  except ValueError:
+    pass
+  from email.utils import parsedate_to_datetime
+
+  try:
+    return max(0.0, parsedate_to_datetime(value).timestamp() - time())
+  except (TypeError, ValueError):
+    return None
+
+
+# (Function)
+# - Description:
+#     Initializer of the processes of a process pool, keep the limiter of the process
+#     for the key of the limiter of the main process.
+# - Return:
+#     None.
+#
+def shareProcess(key, limiter):
+  _processLimiters[key] = limiter
+
+
+# (Function)
+# - Description:
+#     The limiter of the current process for the key, `default` is kept as the limiter of the
+#     process when it has none (a pool given by the user, without the initializer).
+# - Return:
+#     The RateLimiter shared by all the tasks of the process.
+#
+def processLimiter(key, default=None):
+  return _processLimiters.setdefault(key, default)
+
+
+class RateLimiter():
+  """
+  Description
+  ~~~~~~~~~~~~~~~~~~~~~
+    A token bucket shared by all the workers of a instance (threads and the async engine).
+    Each request takes one token, the tokens are refilled at `rate` by second until `burst`.
+
+    When Semantic Scholar answer 429 (or 503) the rate is cut by `decrease` and all the
+    workers wait the `Retry-After` of the response (or `pause` seconds when it is missing).
+    Each request with success ramp the rate back by `increase * maxRate` until `maxRate`.
+
+    With a process pool each process keeps one limiter for all its tasks, with the rate and
+    the burst divided by the processes (see `.share()`), a 429 pauses the pages of its process.
+
+  Parameters
+  ~~~~~~~~~~~~~~~~~~~~~
+
+  `RateLimiter(rate = 10, burst = 10, minRate = 0.1, pause = 5, decrease = 0.5, increase = 0.05)`:
+    - `rate : (float)` |
+          Maximum requests by second.
+    - `burst : (int)` |
+          Maximum requests made at once after a idle time.
+    - `minRate : (float)` |
+          The rate is never cut below it.
+    - `pause : (float)` |
+          Seconds to wait after a 429 without Retry-After.
+
+  Example
+  ~~~~~~~~~~~~~~~~~~~~~
+
+   >>> from S2query import S2paperAPI, RateLimiter
+   >>> m = S2paperAPI(poolCPU=16, limiter=RateLimiter(rate=100, burst=20))
+  """
+  def __init__(self, rate=10, burst=10, minRate=0.1, pause=5, decrease=0.5, increase=0.05):
+    self.maxRate = rate
+    self.rate = rate
+    self.burst = burst
+    self.minRate = min(minRate, rate)
+    self.pause = pause
+    self.decrease = decrease
+    self.increase = increase
+    self._tokens = burst
+    self._last = monotonic()
+    self._until = 0
+    self._lock = threading.Lock()
+    self.key = os.urandom(8).hex()
+
+  # Function that take one token, return the seconds to wait when there is none.
+  def _reserve(self):
+    with self._lock:
+      now = monotonic()
+      if now < self._until:
+        return self._until - now
+
+      self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+      self._last = now
+      if self._tokens >= 1:
+        self._tokens -= 1
+        return 0
+      return (1 - self._tokens) / self.rate
+
+  def acquire(self):
+    """
+    Wait until a request can be made.
+    """
+    wait = self._reserve()
+    while wait > 0:
+      sleep(wait)
+      wait = self._reserve()
+
+  async def aacquire(self):
+    """
+    Wait until a request can be made, without blocking the event loop.
+    """
+    import asyncio
+
+    wait = self._reserve()
+    while wait > 0:
+      await asyncio.sleep(wait)
+      wait = self._reserve()
+
+  def update(self, code, retry=None):
+    """
+    Adapt the rate to the status code of a response and its header Retry-After.
+    """
+    with self._lock:
+      if code in (429, 503):
+        self.rate = max(self.minRate, self.rate * self.decrease)
+        wait = retryAfter(retry)
+        wait = self.pause if wait is None else wait
+        self._until = max(self._until, monotonic() + wait)
+        self._tokens = 0
+      elif code is not None and code < 400 and self.rate < self.maxRate:
+        self.rate = min(self.maxRate, self.rate + self.increase * self.maxRate)
+
+  def share(self, workers):
+    """
+    A copy of the limiter with the rate divided by the workers, used by each
+    process of a process pool, where the bucket can not be shared.
+    """
+    limiter = RateLimiter(self.maxRate / workers, max(1, self.burst // workers),
+                          self.minRate / workers, self.pause, self.decrease, self.increase)
+    limiter.rate = self.rate / workers
+    return limiter
+
+  def __getstate__(self):
+    state = self.__dict__.copy()
+    del state["_lock"]
+    return state
+
+  def __setstate__(self, state):
+    self.__dict__.update(state)
+    self._lock = threading.Lock()
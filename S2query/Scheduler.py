@@ -0,0 +1,110 @@
+import heapq
+import random
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, wait
+from time import monotonic, sleep
+
+
+BadCall = namedtuple("BadCall", ["page", "attempts", "code", "error"])
+BadCall.__doc__ = """
+A page (or offset) that was not returned: the last status code and error after all the attempts.
+"""
+
+
+# (Function)
+# - Description:
+#     The text of a error returned by a request, short enough to be kept.
+# - Return:
+#     A str or None.
+#
+def errorText(res, size=300):
+  text = res if isinstance(res, str) else getattr(res, "text", None)
+  return None if text is None else text[:size]
+
+
+class Scheduler():
+  """
+  Description
+  ~~~~~~~~~~~~~~~~~~~~~
+    Keep `workers` requests in flight all the time. A page that fails goes back
+    to the queue with its own exponential backoff with jitter, while the others
+    keep running, until `retries` attempts. The pages that are not returned are
+    reported as `BadCall(page, attempts, code, error)`.
+
+  Parameters
+  ~~~~~~~~~~~~~~~~~~~~~
+
+  `Scheduler(retries = 5, backoff = 1, maxBackoff = 60, jitter = 0.5)`:
+    - `retries : (int)` |
+          Maximum attempts of a page.
+    - `backoff : (float)` |
+          Seconds to wait before the second attempt, doubled at each attempt.
+    - `maxBackoff : (float)` |
+          Maximum seconds to wait between two attempts.
+    - `jitter : (float)` |
+          Fraction of the wait that is random, so the pages do not retry at the same time.
+  """
+  def __init__(self, retries=5, backoff=1, maxBackoff=60, jitter=0.5):
+    self.retries = retries
+    self.backoff = backoff
+    self.maxBackoff = maxBackoff
+    self.jitter = jitter
+
+  def delay(self, attempt):
+    """
+    Seconds to wait after the attempt number `attempt` failed.
+    """
+    wait = min(self.maxBackoff, self.backoff * 2 ** (attempt - 1))
+    return wait * (1 - self.jitter * random.random())
+
+  def run(self, pool, fetch, items, workers, badcalls, fatal=None, attempts=None, metrics=None):
+    """
+    Run `fetch(item)` for all the items in the pool, `fetch` return `[res, item, code]`.
+    Yield the results with code 200 as soon as they are done, the items given up are
+    appended to `badcalls`. `fatal(res, code)` tells the errors that must not be retried,
+    and the dict `attempts` (when given) is filled with the attempts of each item. The
+    retries, pages given up and pages waiting and running are kept in `metrics` (when given).
+    """
+    queue = [(0, i, item, 1) for i, item in enumerate(items)]
+    heapq.heapify(queue)
+    running = {}
+
+    while queue or running:
+      now = monotonic()
+      while queue and queue[0][0] <= now and len(running) < workers:
+        _, i, item, attempt = heapq.heappop(queue)
+        running[pool.submit(fetch, item)] = (i, item, attempt)
+        if attempts is not None:
+          attempts[item] = attempt
+
+      if metrics is not None:
+        metrics.queue(len(queue), len(running))
+
+      timeout = None
+      if queue and len(running) < workers:
+        timeout = max(0, queue[0][0] - now)
+      if not running:
+        sleep(timeout)
+        continue
+
+      done, _ = wait(running, timeout, return_when=FIRST_COMPLETED)
+      for future in done:
+        i, item, attempt = running.pop(future)
+        try:
+          res, _, code = future.result()
+        except Exception as err:
+          res, code = str(err), None
+
+        if code == 200:
+          yield res, item, code
+        elif (fatal is not None and fatal(res, code)) or attempt >= self.retries:
+          badcalls.append(BadCall(item, attempt, code, errorText(res)))
+          if metrics is not None:
+            metrics.badcall(badcalls[-1])
+        else:
+          heapq.heappush(queue, (monotonic() + self.delay(attempt), i, item, attempt + 1))
+          if metrics is not None:
+            metrics.retry(item, attempt, code)
+
+    if metrics is not None:
+      metrics.queue(0, 0)
@@ -1,26 +1,101 @@
-import requests
-import json
-import multiprocessing as mp
-import pandas as pd
-from time import sleep, time
+from datetime import date, timedelta
+import logging
 import os
+import re
+from collections import namedtuple
+from itertools import zip_longest
 
-# (Decorantor)
+from . import Cache
+from . import Compact
+from . import Json
+from . import Storage
+from .Client import S2client
+from .Dedup import PaperIndex
+from .Metrics import timer
+from .Scheduler import errorText
+from .Sync import SyncState
+
+
+logger = logging.getLogger(__name__)
+
+# The default columns returned by the API.
+FIELDS = ["paperId",
+          "title",
+          "abstract",
+          "isOpenAccess",
+          "fieldsOfStudy",
+          "url",
+          "venue", 
+          "year", 
+          "referenceCount",
+          "citationCount",
+          "influentialCitationCount",
+          "authors"]
+
+# The fields of study of the filter of the API, used to split the shards of a single year.
+FIELDS_OF_STUDY = ["Computer Science",
+                   "Medicine",
+                   "Chemistry",
+                   "Biology",
+                   "Materials Science",
+                   "Physics",
+                   "Geology",
+                   "Psychology",
+                   "Art",
+                   "History",
+                   "Geography",
+                   "Sociology",
+                   "Business",
+                   "Political Science",
+                   "Economics",
+                   "Philosophy",
+                   "Mathematics",
+                   "Engineering",
+                   "Environmental Science",
+                   "Agricultural and Food Sciences",
+                   "Education",
+                   "Law",
+                   "Linguistics"]
+
+# The papers that a search can return, the API refuses offset + limit past 10.000.
+MAX_RESULTS = 9999
+
+# The maximum papers of a page of the search of the API.
+PAGE_SIZE = 100
+
+
+# (Function)
 # - Description:
-#     Function that times the execution of other functions
+#     The id of a paper as the API expects it, the DOIs and arXiv ids without
+#     prefix get "DOI:" and "ARXIV:", the others are kept (paperId, "PMID:"...).
 # - Return:
-#     Print the time consuming of a function
+#     A str.
 #
-def timer(fun):
-  def warper(*args, **kwargs):
-    start = time()
-    d = fun(*args, **kwargs)
-    end = time()
-    print(f"[{fun.__name__}]>> Took {round(end-start,2)}s")
-    return d
-  return warper
-
-class S2paperAPI():
+def paperId(id):
+  id = str(id).strip()
+  if id.startswith("10.") and "/" in id:
+    return "DOI:" + id
+  if re.fullmatch(r"\d{4}\.\d{4,5}(v\d+)?", id):
+    return "ARXIV:" + id
+  return id
+
+
+# A page of a search of get_many, with all the state needed to request it.
+PageRequest = namedtuple("PageRequest", ["query", "offset", "limit", "fields"])
+
+
+# (Function)
+# - Description:
+#     Split a search in the pages of 100 papers to request, from `offset`
+#     to `offset + n`, inside the limit of the API.
+# - Return:
+#     A list of PageRequest.
+#
+def pageRequests(query, n, offset, fields):
+  end = min(offset + n, MAX_RESULTS)
+  return [PageRequest(query, start, min(PAGE_SIZE, end - start), fields) for start in range(offset, end, PAGE_SIZE)]
+
+class S2paperAPI(S2client):
   """
   Description
   ~~~~~~~~~~~~~~~~~~~~~
@@ -30,11 +105,35 @@ class S2paperAPI():
   Parameters
   ~~~~~~~~~~~~~~~~~~~~~
   
-  `SearchAPI(poolCPU = 4, sleeptry = 5)`:
+  `SearchAPI(poolCPU = 4, sleeptry = 5, executor = "thread", transport = None, limiter = None, scheduler = None, cache = None, memo = None, dedup = None, metrics = None)`:
     - `poolCPU : (int)` |
-      Number of cores of CPU to make multiples request in the same time.
+      Number of workers to make multiples request in the same time.
     - `sleeptry : (float)` |
-      Seconds to wait for try again when Semantic Scholar block the requests.
+      Seconds to wait for try again when Semantic Scholar block the requests without a Retry-After.
+    - `executor : (str | concurrent.futures.Executor)` |
+      The pool of workers, "thread", "process", "serial" or a Executor created by the user.
+      The pool is reused by all the calls of `.get()` until `.close()`.
+    - `transport : (Transport)` |
+      The HTTP layer, a `Transport(poolSize, timeout, compress, headers)`. The default keeps the connections
+      alive and ask compressed responses.
+    - `limiter : (RateLimiter)` |
+      The rate limiter shared by all the workers, the default is `RateLimiter(rate = 10, burst = 10, pause = sleeptry)`.
+      It slow down when Semantic Scholar answer 429 and ramp up again when the errors stop.
+    - `scheduler : (Scheduler)` |
+      The retry policy of the pages that fail, the default is `Scheduler(retries = 5, backoff = 1, maxBackoff = 60)`.
+      The pages given up are in `.badcalls`.
+    - `cache : (ResponseCache)` |
+      A persistent cache of the responses, the same request is not made again while it is valid.
+      The default is None, no cache.
+    - `memo : (PageMemo)` |
+      A in memory LRU of the pages already parsed, reused by the calls of `.get()` that overlap.
+      The default is None.
+    - `dedup : (PaperIndex)` |
+      A index of the paperIds already returned, the repeated papers are dropped of all the calls
+      while the index is kept. The default is None, the papers are not deduplicated.
+    - `metrics : (Metrics)` |
+      The measures of the requests, retries and phases, read in `.metrics`. The default is a new Metrics,
+      one can be shared by many instances.
   
   Example
   ~~~~~~~~~~~~~~~~~~~~~
@@ -50,11 +149,15 @@ class S2paperAPI():
    Name: title, dtype: object
 
 """
-  def __init__(self, poolCPU=4, sleeptry=5):
+  def __init__(self, poolCPU=4, sleeptry=5, executor="thread", transport=None, limiter=None, scheduler=None, cache=None, memo=None, dedup=None, metrics=None):
+    super().__init__(poolCPU, executor, transport, limiter, scheduler, cache, memo, rate=10, pause=sleeptry, dedup=dedup, metrics=metrics)
     self.sleeptry = sleeptry
-    self.poolCPU = poolCPU
-    self.badcalls = []
     self._api = "https://api.semanticscholar.org/graph/v1/paper/search"
+    self._batchApi = "https://api.semanticscholar.org/graph/v1/paper/batch"
+    self._offset = 0
+    self._end = None
+    self._aligned = False
+    self.total = None
    
  
   # The main Function to get the papers.
@@ -80,11 +183,22 @@ class S2paperAPI():
           A list of positions of the papers (0 is the first one), if pass a list, the parameters (n, offset)
           have no effect in the main query (search). The default is a empty list [].
     - `save : (bool)` |
-          If true, will save the data set in a file csv at the current directory. the default is False.
+          If true, will save the data set in a file csv at the current directory, the new rows are
+          appended at each check point. the default is False.
     - `saveName : (str)` |
           The name of the file when the save is set True.
+    - `saveFormat : (str)` |
+          The format of the file, "csv" or "parquet" (a row group by check point, needs pyarrow).
+          The default is "csv".
+    - `resume : (bool)` |
+          If true, continue a search saved that was stopped: only the pages missing or failed in the
+          manifest (./saveName.manifest) are requested and the rows are added to the file (`.all` has only
+          the pages requested now). The default is False.
     - `fields : list(str)` |
           The dataframe columns that the Semantic Scholar API returns, see the documentation in <https://api.semanticscholar.org/graph/v1#operation/get_graph_get_paper_search>.
+    - `compact : (bool)` |
+          If true, (.all) is a CompactResult: the papers with the venue and the year as categories, and the
+          authors and the fields of study in tables linked by paperId. The default is False.
     
     Returns
     ~~~~~~~~~~~~~~~~~~~~~
@@ -92,11 +206,523 @@ class S2paperAPI():
         When the parameter (save) is False, the data set found will be in the (.all) variable as pandas
         Dataframe of the class instantiated.
     """
+    import pandas as pd
+    
+    batches = self._plan(search, n, offset, papers, save, **kwargs)
+
+    logger.info(f"[get]>> Searching... {self.n} papers from the offset {offset}")
+
+    pool = self._pool()
+    self._openFile(kwargs.get('resume', False))
+    try:
+      for offsets in batches:
+        self._runtime(pool, offsets)
+    finally:
+      self._closeFile()
+      
+    order = sorted(range(len(self.all)), key=self._order.__getitem__)
+    self.all = self._result(pd.concat([self.all[i] for i in order], ignore_index=True) if len(order) != 0 else pd.DataFrame(),
+                            kwargs.get('compact', False))
+    """
+    A dataFrame with all content as pandas DataFrame
+    """
+
+
+  # Iterator over the pages of a search, with a bounded number of pages in memory.
+  def iter_pages(self, search="artificial intelligence", n=10, offset=0, papers=[], buffer=None, **kwargs):
+    """
+    .iter_pages()
+    ~~~~~~~~~~~~~~~~~~~~~
+    
+    `for page in SearchAPI().iter_pages(search, n = 10, offset = 0, papers = [], buffer = None, **kwargs)`
+    
+    Yield each page as a pandas DataFrame as soon as it arrives (not in the offset order), without
+    keeping them in `.all`. The parameters are the same of `.get()`, and:
+
+    - `buffer : (int)` |
+          Maximum pages requested or waiting to be consumed at the same time, the default is `poolCPU`.
+          The memory used does not grow with `n`.
+    
+    Example
+    ~~~~~~~~~~~~~~~~~~~~~
+    
+     >>> m = S2paperAPI()
+     >>> for page in m.iter_pages("artificial intelligence", n=10000):
+     ...   page.to_csv("Data.csv", mode="a", header=False)
+    """
+    batches = self._plan(search, n, offset, papers, False, **kwargs)
+    pool = self._pool()
+
+    badcalls = []
+    for offsets in batches:
+      hits, offsets = self._recall(offsets)
+      for page, data in hits.items():
+        self._totals(data)
+        yield self._unique(self._window(page, data))
+
+      for data, page, _ in self._schedule(pool, self._query, offsets, buffer or self.poolCPU, badcalls, self._fatal):
+        self._totals(data)
+        self._memoize(page, data)
+        yield self._unique(self._window(page, data))
+
+    self._saveBadcalls(badcalls)
+
+  # Iterator over the papers of a search, with a bounded number of pages in memory.
+  def iter_papers(self, search="artificial intelligence", n=10, offset=0, papers=[], buffer=None, **kwargs):
+    """
+    .iter_papers()
+    ~~~~~~~~~~~~~~~~~~~~~
+    
+    `for paper in SearchAPI().iter_papers(search, n = 10, offset = 0, papers = [], buffer = None, **kwargs)`
+    
+    Yield each paper as a dictionary of the `fields`, the parameters are the same of `.iter_pages()`.
+    """
+    for page in self.iter_pages(search, n, offset, papers, buffer, **kwargs):
+      yield from page.to_dict("records")
+
+  # Function to get only the papers of a search that are not known by the previous syncs.
+  @timer
+  def sync(self, search="artificial intelligence", store="./S2sync.sqlite", lookback=30, save=False, **kwargs):
+    """
+    .sync()
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    `S2paperAPI().sync(search, store = "./S2sync.sqlite", lookback = 30, save = False, **kwargs)`
+
+    Get the papers of a search that were not returned by the previous syncs of the same search,
+    and add them to the state (and to the file when saved). The first sync gets the whole search
+    (at most 10.000 papers), the next ones only the papers published since the newest publication
+    date seen minus `lookback` days (the filter `publicationDateOrYear` of the API), so a daily
+    refresh costs a request by 100 papers published in the window, not by 100 papers of the search.
+
+    Parameters
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    - `store : (str or SyncState)` |
+          The SQLite file (or a SyncState) where the paperIds and the newest `publicationDate` of each search
+          are kept. The default is "./S2sync.sqlite".
+    - `lookback : (int)` |
+          Days before the newest publication date also requested, for the papers indexed late. The default is 30.
+    - `save : (bool)` |
+          If true, the new papers are appended to ./saveName.saveFormat, the file of the previous syncs.
+    - `fields, saveName, saveFormat, compact` |
+          The same of `.get()`, the fields "paperId" and "publicationDate" are always requested.
+
+    When a page fails (see `.badcalls`) neither the state nor the file are changed, and the next
+    sync requests the same papers again.
+
+    Returns
+    ~~~~~~~~~~~~~~~~~~~~~
+
+        The new papers in (.all), as in `.get()`, and their number in (.new).
+
+    Example
+    ~~~~~~~~~~~~~~~~~~~~~
+
+     >>> m = S2paperAPI()
+     >>> m.sync("graph neural networks", save=True)    # every day
+     >>> m.new
+     52
+    """
+    import pandas as pd
+    fields = list(kwargs.get('fields', FIELDS))
+    fields += [field for field in ("paperId", "publicationDate") if field not in fields]
+    state = store if isinstance(store, SyncState) else SyncState(store)
+    job = Cache.requestKey("GET", self._api, {"query": search})
+    pool = self._pool()
+
+    try:
+      newest = state.newest(job)
+      window = {}
+      if newest is not None:
+        window["publicationDateOrYear"] = f"{date.fromisoformat(newest) - timedelta(days=lookback)}:"
+
+      badcalls = []
+      batches = self._plan(search, MAX_RESULTS, 0, [], save, **dict(kwargs, fields=fields))
+      self.params.update(window)
+
+      pages = {}
+      for offsets in batches:
+        for data, offset, _ in self._schedule(pool, self._query, offsets, self.poolCPU, badcalls, self._fatal):
+          self._totals(data)
+          pages[offset] = data
+      if (self.total or 0) > MAX_RESULTS:
+        logger.warning(f"[sync]>> The search has {self.total} papers, only {MAX_RESULTS} are returned.")
+      frame = pd.concat([pages[offset] for offset in sorted(pages)], ignore_index=True) if len(pages) != 0 else pd.DataFrame(columns=fields)
+      # The pages without papers ("data": []) have no columns.
+      frame = frame.reindex(columns=frame.columns.union(fields, sort=False))
+
+      frame = frame[frame['paperId'].notna()].drop_duplicates('paperId', ignore_index=True)
+      known = state.known(job, frame['paperId'])
+      new = frame[~frame['paperId'].isin(known)].reset_index(drop=True)
+      dates = frame['publicationDate'].dropna()
+      latest = max(dates) if len(dates) != 0 else None
+
+      if len(badcalls) != 0:
+        self._saveBadcalls(badcalls)
+        logger.warning("[sync]>> Some pages failed, the state and the file are not changed.")
+      else:
+        if self.saveFile and len(new) != 0:
+          writer = Storage.TableWriter(os.path.join(os.getcwd(), f'{self.saveName}.{self.saveFormat}'), self.saveFormat, append=True)
+          with writer, self.metrics.time("save"):
+            writer.write(new)
+          logger.info(f"[Save]>> Saved in {writer.path}")
+        state.commit(job, search, list(new['paperId']), latest)
+    finally:
+      if state is not store:
+        state.close()
+
+    logger.info(f"[sync]>> {len(new)} new papers of {len(frame)} requested.")
+    self.all = self._result(new, kwargs.get('compact', False))
+    self.new = len(new)
+    """
+    The number of new papers found by the last sync.
+    """
+
+  # Function to get known papers by their ids, with the batch endpoint of the API.
+  @timer
+  def get_by_ids(self, ids, fields=FIELDS, batchSize=500, save=False, **kwargs):
+    """
+    .get_by_ids()
+    ~~~~~~~~~~~~~~~~~~~~~
+    
+    `SearchAPI().get_by_ids(ids, fields = [...], batchSize = 500, save = False, saveName = Data)`
     
+    Parameters
+    ~~~~~~~~~~~~~~~~~~~~~
+    
+    - `ids : list(str)` |
+          The ids of the papers: paperIds, DOIs, arXiv ids or the ids with prefix of the API ("PMID:", "CorpusId:"...).
+    - `fields : list(str)` |
+          The dataframe columns, the same of `.get()`.
+    - `batchSize : (int)` |
+          Number of ids by request, the maximum of the API is 500. The batches are requested at the same time.
+    - `save : (bool)` |
+          If true, will save the data set in a file at the current directory, as in `.get()`.
+    
+    Returns
+    ~~~~~~~~~~~~~~~~~~~~~
+    
+        The papers found in the (.all) variable as a pandas DataFrame, in the order of the ids. The ids not
+        found are in (.notFound) and the batches that fail in (.badcalls).
+
+     >>> m = S2paperAPI()
+     >>> m.get_by_ids(["649def34f8be52c8b66281af98ae884c09aef38b", "10.1038/nrn3241", "1705.10311"])
+     >>> m.all.shape
+     (3, 12)
+    """
+    import pandas as pd
     self.saveName = kwargs.get('saveName', "Data")
+    self.saveFormat = kwargs.get('saveFormat', "csv")
     self.saveFile = save
-    self._offset = offset
+    self.badcalls = []
+    self.notFound = []
+    """
+    The ids that the API did not find.
+    """
+    self._batchFields = ",".join(fields)
+
+    ids = [paperId(id) for id in ids]
+    batches = [tuple(ids[i:i+batchSize]) for i in range(0, len(ids), batchSize)]
+    order = {batch: i for i, batch in enumerate(batches)}
+
+    self._writer = None
+    if self.saveFile:
+      self._writer = Storage.TableWriter(os.path.join(os.getcwd(), f'{self.saveName}.{self.saveFormat}'), self.saveFormat)
+
+    papers = {}
+    badcalls = []
+    try:
+      for data, batch, _ in self._schedule(self._pool(), self._queryBatch, batches, self.poolCPU, badcalls):
+        papers[order[batch]] = self._unique(self._pandasBatch(data, batch))
+        if self.saveFile:
+          with self.metrics.time("save"):
+            self._writer.write(papers[order[batch]])
+    finally:
+      self._closeFile()
+
+    self._saveBadcalls(badcalls)
+    self.all = self._result(pd.concat([papers[i] for i in sorted(papers)], ignore_index=True) if len(papers) != 0 else pd.DataFrame(),
+                            kwargs.get('compact', False))
+
+  # Function to get a search past the 10.000 papers, splitting it in shards with filters.
+  @timer
+  def get_sharded(self, search="artificial intelligence", years=None, fieldsOfStudy=FIELDS_OF_STUDY, maxRequests=None, save=False, **kwargs):
+    """
+    .get_sharded()
+    ~~~~~~~~~~~~~~~~~~~~~
+    
+    `SearchAPI().get_sharded(search, years = (1900, this year), fieldsOfStudy = [...], maxRequests = None, save = False, saveName = Data)`
+    
+    The API returns at most 10.000 papers of a search. Here the search is split in disjoint shards by
+    ranges of year, halved until each shard has less than 10.000 papers, and the years that still have
+    more are split by field of study. All the shards are requested at the same time and the papers
+    found in more than one shard (with many fields of study) are kept once, with the `dedup` of the
+    instance or a new PaperIndex.
+
+    Only the papers with a year (and, for the years split by field, with a field of study) are found.
+    
+    Parameters
+    ~~~~~~~~~~~~~~~~~~~~~
+    
+    - `search : (str)` |
+          The main query in Semantic Scholar API about the papers.
+    - `years : tuple(int)` |
+          The first and last year of the search, the default is from 1900 to the current year.
+    - `fieldsOfStudy : list(str)` |
+          The fields of study used to split a single year, if it is a empty list the year is cut at 10.000 papers.
+    - `maxRequests : (int)` |
+          Maximum requests of pages, the shards are requested in order until it. The default is all the pages.
+    - `save : (bool)` |
+          If true, will save the data set in a file at the current directory, as in `.get()`.
+    - `maxShard : (int)` |
+          Maximum papers of a shard, the default is the limit of the API.
+    - `fields : list(str)` |
+          The dataframe columns, the same of `.get()`.
+    
+    Returns
+    ~~~~~~~~~~~~~~~~~~~~~
+    
+        The papers found in the (.all) variable as a pandas DataFrame, without repeated paperId. The shards
+        and their number of papers are in (.shards).
+
+     >>> m = S2paperAPI(poolCPU=8)
+     >>> m.get_sharded("deep learning", years=(2015, 2020), maxRequests=500)
+     >>> m.all.shape
+     (50000, 12)
+    """
+    import pandas as pd
+    self.saveName = kwargs.get('saveName', "Data")
+    self.saveFormat = kwargs.get('saveFormat', "csv")
+    self.saveFile = save
+    self.badcalls = []
+    self._maxShard = min(kwargs.get('maxShard', MAX_RESULTS), MAX_RESULTS)
+    self.params = {
+    "query": search,
+    "limit": PAGE_SIZE,
+    "fields": ",".join(kwargs.get('fields', FIELDS)),
+    }
+    self._end = None
+    years = years or (1900, date.today().year)
+
+    pool = self._pool()
+    self.shards = self._shards(pool, (tuple(years), None), fieldsOfStudy)
+    """
+    The shards of the search, ((first year, last year), field of study) and their number of papers.
+    """
+
+    self._shardTotals = dict(self.shards)
+    pages = [(shard, offset) for shard, total in self.shards for offset in range(0, total, PAGE_SIZE)]
+    if maxRequests is not None:
+      pages = pages[:maxRequests]
+
+    logger.info(f"[get_sharded]>> {len(self.shards)} shards, {len(pages)} pages...")
+
+    self._writer = None
+    if self.saveFile:
+      self._writer = Storage.TableWriter(os.path.join(os.getcwd(), f'{self.saveName}.{self.saveFormat}'), self.saveFormat)
+
+    papers = {}
+    seen = self.dedup if self.dedup is not None else PaperIndex()
+    badcalls = []
+    try:
+      res = []
+      for page in self._schedule(pool, self._queryShard, pages, self.poolCPU, badcalls, self._fatal):
+        res.append(page)
+        if len(res) == self.poolCPU:
+          papers.update(self._extractShards(res, seen))
+          res = []
+      if len(res) != 0:
+        papers.update(self._extractShards(res, seen))
+    finally:
+      self._closeFile()
+
+    self._saveBadcalls(badcalls)
+    order = [page for page in pages if page in papers]
+    self.all = self._result(pd.concat([papers[page] for page in order], ignore_index=True) if len(papers) != 0 else pd.DataFrame(),
+                            kwargs.get('compact', False))
+
+  # Function to get many searches at the same time, in the same pool of workers.
+  @timer
+  def get_many(self, queries, n=10, offset=0, save=False, **kwargs):
+    """
+    .get_many()
+    ~~~~~~~~~~~~~~~~~~~~~
+    
+    `SearchAPI().get_many(queries, n = 10, offset = 0, save = False, saveName = Data, fields = [...])`
+    
+    Run many searches in the same pool of workers, rate limiter and connections. The pages of
+    the searches are requested in turns (the first page of all the searches, then the second...),
+    so all of them advance together and the speed is limited by the rate of the API, not by the
+    searches made one after the other. Each page carries its own search, so the calls do not share
+    state in the instance.
+    
+    Parameters
+    ~~~~~~~~~~~~~~~~~~~~~
+    
+    - `queries : list(str)` |
+          The searches, the repeated ones are made once.
+    - `n : (int)` |
+          The number of papers to get of each search, the maximum is 10.000.
+    - `offset : (int)` |
+          Where start to return the papers of each search.
+    - `save : (bool)` |
+          If true, will save the papers of all the searches in one file at the current directory, with
+          a column `query`, as in `.get()`.
+    - `fields : list(str)` |
+          The dataframe columns, the same of `.get()`.
+    
+    Returns
+    ~~~~~~~~~~~~~~~~~~~~~
+    
+        The (.all) variable as a dictionary of the search to its pandas DataFrame. The pages not returned
+        are in (.badcalls), and by search in (.errors).
+
+     >>> m = S2paperAPI(poolCPU=16)
+     >>> m.get_many(["deep learning", "graph neural networks", "protein folding"], n=300)
+     >>> m.all["protein folding"].shape
+     (300, 12)
+    """
+    import pandas as pd
+    self.saveName = kwargs.get('saveName', "Data")
+    self.saveFormat = kwargs.get('saveFormat', "csv")
+    self.saveFile = save
+    self.badcalls = []
+    fields = ",".join(kwargs.get('fields', FIELDS))
+    queries = list(dict.fromkeys(queries))
+
+    plans = [pageRequests(query, n, offset, fields) for query in queries]
+    requests = [page for pages in zip_longest(*plans) for page in pages if page is not None]
+
+    logger.info(f"[get_many]>> {len(queries)} searches, {len(requests)} pages...")
+
+    self._writer = None
+    if self.saveFile:
+      self._writer = Storage.TableWriter(os.path.join(os.getcwd(), f'{self.saveName}.{self.saveFormat}'), self.saveFormat)
+
+    pool = self._pool()
+    pages = {query: {} for query in queries}
+    badcalls = []
+    try:
+      res = []
+      for page in self._schedule(pool, self._queryMany, requests, self.poolCPU, badcalls, self._fatal):
+        res.append(page)
+        if len(res) == self.poolCPU:
+          self._extractMany(res, pages)
+          res = []
+      if len(res) != 0:
+        self._extractMany(res, pages)
+    finally:
+      self._closeFile()
+
+    self._saveBadcalls(badcalls)
+    self.errors = {}
+    """
+    The pages not returned of each search.
+    """
+    for bad in badcalls:
+      self.errors.setdefault(bad.page.query, []).append(bad)
+    self.all = {query: self._result(pd.concat([found[offset] for offset in sorted(found)], ignore_index=True) if len(found) != 0 else pd.DataFrame(),
+                                    kwargs.get('compact', False))
+                for query, found in pages.items()}
+
+  # The async version of get, all the pages are requested in the same event loop.
+  async def aget(self, search="artificial intelligence", n=10, offset=0, papers=[], save=False, concurrency=100, **kwargs):
+    """
+    .aget()
+    ~~~~~~~~~~~~~~~~~~~~~
+    
+    `await SearchAPI().aget(search, n = 10, offset = 0, papers = [], save = False, concurrency = 100, **kwargs)`
+    
+    The same parameters (`resume` included) and result of `.get()`, but the pages are requested with aiohttp
+    in a single event loop instead of a pool of processes.
+
+    - `concurrency : (int)` |
+          Maximum number of pages requested at the same time. The default is 100.
+    
+    Example
+    ~~~~~~~~~~~~~~~~~~~~~
+    
+     >>> import asyncio
+     >>> m = S2paperAPI()
+     >>> asyncio.run(m.aget("artificial intelligence", n=500))
+     >>> m.all.shape
+     (500, 12)
+    """
+    import pandas as pd
+    pages = [page async for page in self._apages(search, n, offset, papers, save, concurrency, **kwargs)]
+    pages.sort(key=lambda page: page[0])
+
+    self.all = pd.concat([data for _, data in pages], ignore_index=True) if len(pages) != 0 else pd.DataFrame()
+
+    self._openFile(kwargs.get('resume', False))
+    try:
+      if self.saveFile:
+        with self.metrics.time("save"):
+          self._writer.write(self.all)
+        self._markWritten(self._writer.path)
+    finally:
+      self._closeFile()
+    self.all = self._result(self.all, kwargs.get('compact', False))
+
+  # Async iterator over the pages of a search, for `async for`.
+  async def aiter_pages(self, search="artificial intelligence", n=10, offset=0, papers=[], concurrency=100, **kwargs):
+    """
+    .aiter_pages()
+    ~~~~~~~~~~~~~~~~~~~~~
+    
+    `async for page in SearchAPI().aiter_pages(search, n = 10, offset = 0, papers = [], concurrency = 100, **kwargs)`
+    
+    Yield each page as a pandas DataFrame as soon as it arrives (not in the offset order).
+    The parameters are the same of `.aget()`.
+    """
+    async for _, data in self._apages(search, n, offset, papers, False, concurrency, **kwargs):
+      yield data
+
+# The async engine, yield (offset, DataFrame) of the pages that have success.
+  async def _apages(self, search, n, offset, papers, save, concurrency, **kwargs):
+    batches = self._plan(search, n, offset, papers, save, **kwargs)
+    # The manifest is cleared (or resumed) like in .get(), the pages are marked done by .aget() once written.
+    self._openManifest(kwargs.get('resume', False))
+    self._written = []
+
+    from . import AsyncScript
+
+    badcalls = []
+    async with AsyncScript.session(concurrency, self.transport) as session:
+      for offsets in batches:
+        hits, offsets = self._recall(self._pending(offsets))
+        for page, data in hits.items():
+          self._totals(data)
+          self._written.append((self._jobKey(), page))
+          yield page, self._unique(self._window(page, data))
+
+        async for data, page, code in AsyncScript.runPages(lambda page: self._aquery(session, page), offsets,
+                                                           concurrency, self.scheduler, badcalls, self._fatal, self.metrics):
+          self._totals(data)
+          self._memoize(page, data)
+          self._written.append((self._jobKey(), page))
+          yield page, self._unique(self._window(page, data))
+
+    self._saveBadcalls(badcalls)
+
+# Function that make async requisitions on the API of Semantic Scholar.
+  async def _aquery(self, session, offset):
+    return await self._afetch(session, offset, self._parsePage, "GET", self._api, params=self._pageParams(offset))
+
+# Function that set the state of a search and return the batches of offsets to request.
+  def _plan(self, search, n, offset, papers, save, **kwargs):
+    self.saveName = kwargs.get('saveName', "Data")
+    self.saveFormat = kwargs.get('saveFormat', "csv")
+    self.saveFile = save
+    self.badcalls = []
+    self.total = None
+    """
+    The total of papers of the last search, told by the first page returned.
+    """
+    self._probed = False
     self.all = []
+    self._order = []
     """
     A dataFrame with all content as pandas DataFrame.
     """
@@ -107,161 +733,254 @@ class S2paperAPI():
 
     self.params = {
     "query": search,
-    "limit": 100,
-    "fields": ",".join(kwargs.get('fields', ["paperId",
-                                             "title",
-                                             "abstract",
-                                             "isOpenAccess",
-                                             "fieldsOfStudy",
-                                             "url",
-                                             "venue", 
-                                             "year", 
-                                             "referenceCount",
-                                             "citationCount",
-                                             "influentialCitationCount",
-                                             "authors"])),
-    "offset": kwargs.get('offset', 0),
+    "limit": PAGE_SIZE,
+    "fields": ",".join(kwargs.get('fields', FIELDS)),
     }
 
+    # The papers by position, a request of one paper each.
     if len(papers) != 0:
-          self._offsets = papers
-          offsets = papers
-          self.params['limit'] = 1
-          self.n = len(papers)
-    else:
-          inf = self._offset//100
-          sup = (self.n)//100+self._offset//100
-
-          if inf == sup:
-            self._offsets = [inf]
-          else:
-            self._offsets = list(range(inf, sup))
-          self.params['limit'] = 100
-          offsets = [x*100 for x in self._offsets if x*100 < 10000]
-    
-    print("\n")
-    print("Searching...")
-    print("offsets: ")
-    print(offsets)
-
-    with mp.Pool(self.poolCPU) as pool:
-      if self.n > 100:
-            
-        self._runtime(pool, offsets)
-        
-        if len(papers) == 0:
-          if n%100>0:
-            self.params['limit'] = n%100
-            offsets = [offsets[-1] + 100]
-
-            self._runtime(pool, offsets)
-          
-          
-      else:
-        if len(papers) == 0:  
-          offsets = self._offsets
-          self.params['limit'] = n
-        
-        self._runtime(pool, offsets)
-      
-    self.all = pd.concat(self.all, ignore_index=True)
-    """
-    A dataFrame with all content as pandas DataFrame
-    """
+      self.n = len(papers)
+      self.params['limit'] = 1
+      self._end = None
+      return [papers]
 
-    if self.saveFile:
-      words = os.path.join(os.getcwd(), f'{self.saveName}')
-      print(f"[Save]>> Saved in {words}.csv")
+    # With a memo the pages requested are the full pages aligned on PAGE_SIZE, the same for all the
+    # windows of the search, and they are cut to the window [offset, offset + n) once parsed.
+    self._offset = offset
+    self._end = min(offset + self.n, MAX_RESULTS)
+    self._aligned = self.memo is not None
+    return self._batches(offset - offset % PAGE_SIZE if self._aligned else offset)
+
+# The batches of offsets of a search: the first page alone, that tells the total of the search,
+# then all the other pages of PAGE_SIZE papers at the same time, up to the total.
+# When the first page fails the total is unknown and the other pages are not requested.
+  def _batches(self, offset):
+    if offset >= self._end:
+      return
+    yield [offset]
+
+    if not self._probed and not self._done(offset):
+      logger.warning("[_batches]>> The first page failed, the other pages of the search are not requested.")
+      return
+    if self.total is not None:
+      self._end = min(self._end, self.total)
+    offsets = list(range(offset + PAGE_SIZE, self._end, PAGE_SIZE))
+    if len(offsets) != 0:
+      yield offsets
 
+# Function that keep the total of the search told by a page.
+  def _totals(self, data):
+    self._probed = True
+    if self.total is None:
+      self.total = data.attrs.get('total')
 
 # The main function called in get to execute a script to get the papers.
   @timer
   def _runtime(self, pool, offsets):
-    while True:
-      print('\n')
-      print('[_runtime]>> Start searching...')
-
-      try:
-        res = pool.map(self._query, offsets)
-        
-        resultData = pd.DataFrame(res, columns=["Response", "Page", "Code"])
-        resultData.set_index("Page")
-        
-        if resultData.query("Code !=200").size == 0:
-          self._extract(pool, resultData.query("Code ==200"))
-          
-
-          break
-        
-        else:
-          if resultData.query("Code ==200").size != 0:
-            self._extract(pool, resultData.query("Code ==200"))
-              
-          print("Bad call of pages:")
-          offsets = resultData.query("Code !=200")["Page"].values.tolist()
-
-          print(offsets)
-          
-          err = resultData.query("Code !=200")["Response"].tolist()
-          err = [eval(x.text) for x in err]
-          print('Errors: ')
-          print(err)
-          
-          if self.saveFile:
-            try:
-              with open("./BadCalls.text", 'w', encoding='UTF-8') as fp:
-                fp.write(str(offsets))
-            except Exception:
-              print("Fail to save badcalls.")
-          else:
-            self.badcalls = offsets
-           
-          if "Requested data for this limit and/or offset is not available" in err[0]['error']:
-            break
-            
-          print(f"Trying again in {round(self.sleeptry/60, 2)} min...")
-          sleep(self.sleeptry)
-          
-      except Exception:
-        print("[_runtime]>> Error... Trying again.")
-        pass
-      print("---")
+    logger.info('[_runtime]>> Start searching...')
+
+    badcalls = []
+    attempts = {}
+    hits, offsets = self._recall(self._pending(offsets))
+    if len(hits) != 0:
+      self._extract([], hits)
+
+    # The pages are extracted and saved in check points of poolCPU pages, as they arrive.
+    res = []
+    for page in self._schedule(pool, self._query, offsets, self.poolCPU, badcalls, self._fatal, attempts):
+      res.append(page)
+      if len(res) == self.poolCPU:
+        self._extract(res, attempts=attempts)
+        res = []
+    if len(res) != 0:
+      self._extract(res, attempts=attempts)
+
+    self._saveBadcalls(badcalls)
 
   # Function to extract the content of the response and save with all that have success.
   @timer
-  def _extract(self, pool, data):
+  def _extract(self, res, hits={}, attempts={}):
+    import pandas as pd
     try:
-      papers_list = pool.map(self._pandas, data['Response'].tolist())
+      papers = dict(hits)
+      for data, offset, _ in res:
+        self._memoize(offset, data)
+        papers[offset] = data
+      for data in papers.values():
+        self._totals(data)
 
+      offsets = sorted(papers)
+      papers_list = [self._unique(self._window(offset, papers[offset])) for offset in offsets]
       self.all.extend(papers_list)
+      self._order.extend(offsets)
 
     except Exception as error:
-      print("_extract>> [Fail], see .badcall to reextract content.")
+      logger.error("_extract>> [Fail], see .badcall to reextract content.")
       raise error
     
     if self.saveFile:
-      self.save(self.saveName , pd.concat(self.all).reset_index())
+      with self.metrics.time("save"):
+        self._writer.write(pd.concat(papers_list, ignore_index=True))
+      self._mark(offsets, "done", attempts, self._writer.path)
+      logger.info(f"[Save] >> Saving check_point at current directory, {self._writer.path}")
+
+# Function that tells the errors that are not solved trying again.
+  def _fatal(self, res, code):
+    return "Requested data for this limit and/or offset is not available" in str(errorText(res))
       
 # Function that make requisitions on the API of Semantic Scholar.
   def _query(self, offset):
+    return self._fetch(offset, self._parsePage, "GET", self._api, params=self._pageParams(offset))
+
+# Function that split the search in shards with less than maxShard papers, a level of splits by round.
+  def _shards(self, pool, shard, fieldsOfStudy):
+    shards = []
+    level = [shard]
+    while len(level) != 0:
+      badcalls = []
+      split = []
+      for data, shard, _ in self._schedule(pool, self._queryTotal, level, self.poolCPU, badcalls):
+        total = data.get('total', 0)
+        if total <= self._maxShard:
+          if total != 0:
+            shards.append((shard, total))
+          continue
+
+        (first, last), field = shard
+        if first < last:
+          middle = (first + last)//2
+          split.extend([((first, middle), field), ((middle + 1, last), field)])
+        elif field is None and len(fieldsOfStudy) != 0:
+          split.extend(((first, last), name) for name in fieldsOfStudy)
+        else:
+          logger.warning(f"[_shards]>> The shard {shard} has {total} papers, only {self._maxShard} are returned.")
+          shards.append((shard, self._maxShard))
+      self._saveBadcalls(badcalls)
+      level = split
+    return sorted(shards)
+
+# The filters of the API for a shard.
+  def _shardParams(self, shard):
+    (first, last), field = shard
+    params = {"year": str(first) if first == last else f"{first}-{last}"}
+    if field is not None:
+      params["fieldsOfStudy"] = field
+    return params
+
+# Function that request the number of papers of a shard.
+  def _queryTotal(self, shard):
+    params = dict(self.params, limit=1, offset=0, fields="paperId", **self._shardParams(shard))
+    return self._fetch(shard, Json.loads, "GET", self._api, params=params)
+
+# Function that request a page of a shard.
+  def _queryShard(self, page):
+    shard, offset = page
+    params = dict(self._pageParams(offset), **self._shardParams(shard))
+    params['limit'] = min(params['limit'], self._shardTotals[shard] - offset)
+    return self._fetch(page, self._parsePage, "GET", self._api, params=params)
+
+# Function to extract the pages of the shards, keeping only the papers not seen before.
+  def _extractShards(self, res, seen):
+    import pandas as pd
+    papers = {}
+    for data, page, _ in res:
+      papers[page] = self._unique(data, seen)
+
+    if self.saveFile and len(papers) != 0:
+      with self.metrics.time("save"):
+        self._writer.write(pd.concat(list(papers.values()), ignore_index=True))
+      logger.info(f"[Save] >> Saving check_point at current directory, {self._writer.path}")
+    return papers
+
+# Function that request a page of get_many, all the params are in the page.
+  def _queryMany(self, page):
+    params = {"query": page.query, "offset": page.offset, "limit": page.limit, "fields": page.fields}
+    return self._fetch(page, self._parsePage, "GET", self._api, params=params)
+
+# Function to extract the pages of get_many, in the results of its search.
+  def _extractMany(self, res, pages):
+    import pandas as pd
+    check_point = []
+    for data, page, _ in res:
+      data = self._unique(data)
+      pages[page.query][page.offset] = data
+      check_point.append(data.assign(query=page.query))
+
+    if self.saveFile:
+      with self.metrics.time("save"):
+        self._writer.write(pd.concat(check_point, ignore_index=True))
+      logger.info(f"[Save] >> Saving check_point at current directory, {self._writer.path}")
+
+# Function that make a requisition of a batch of ids on the API of Semantic Scholar.
+  def _queryBatch(self, batch):
+    return self._fetch(batch, Json.loads, "POST", self._batchApi, params={"fields": self._batchFields}, body={"ids": list(batch)})
+
+# Function that treat the response of a batch, the ids not found are kept in .notFound.
+  def _pandasBatch(self, data, batch):
+    import pandas as pd
+    self.notFound.extend(id for id, paper in zip(batch, data) if paper is None)
+    return pd.DataFrame([paper for paper in data if paper is not None])
+
+# Function that return the result of a search, in the compact form when it is asked.
+  def _result(self, frame, compact=False):
+    return Compact.compact(frame) if compact else frame
+
+# Function that drop the papers of a page already returned, by the paperId.
+  def _unique(self, data, index=None):
+    index = self.dedup if index is None else index
+    if index is None or 'paperId' not in data.columns:
+      return data
+    mask = index.unique(data['paperId'])
+    return data if all(mask) else data[mask].reset_index(drop=True)
+
+# Function that cut a page to the papers of the window of the search, when the page is a full page of the memo.
+  def _window(self, offset, data):
+    if self._end is None or (offset >= self._offset and offset + len(data) <= self._end):
+      return data
+    return data.iloc[max(0, self._offset - offset):max(0, self._end - offset)].reset_index(drop=True)
+
+# Function that treat the body of a response of the API and return a pandas Dataframe, called in the worker.
+  def _parsePage(self, text):
+    import pandas as pd
+    dict_data = Json.loads(text)
+    data = pd.DataFrame(dict_data['data'])
+    data.attrs['total'] = dict_data.get('total')
+    return data
+
+# The key of the request of one page.
+  def _pageKey(self, offset):
+    return Cache.requestKey("GET", self._api, self._pageParams(offset))
+
+# Function that set the limit and offset of the request of one page, the limit does not pass the end of the search
+# (a full page with a memo).
+  def _pageParams(self, offset):
     params = self.params.copy()
+    if self._end is not None and not self._aligned:
+      params['limit'] = max(1, min(params['limit'], self._end - offset))
     if offset + params['limit'] >= 10000:
       params['limit'] = 10000 - offset - 1
-      params['offset'] = offset
-    else:
-      params['offset'] = offset
-    try:
-      url = self._api +"?query=" + str(params['query']) + "&limit=" + str(params['limit']) + "&fields=" + str(params['fields']) + "&offset=" +  str(params['offset'])
-      res = requests.get(url, timeout=15)
-      res.encoding = 'utf-8'
-      return [res, offset, res.status_code]
-    except Exception:
-      return [None, offset, 400 ]
-
-# Function that treat the response of the API and return a pandas Dataframe.
-  def _pandas(self, res):
-    dict_data = json.loads(res.text)
-    return pd.DataFrame(dict_data['data'])
+    params['offset'] = offset
+    return params
+
+# The key of the job of the manifest, the request without the offset.
+  def _jobKey(self):
+    return Cache.requestKey("GET", self._api, {k: v for k, v in self.params.items() if k != 'offset'})
+
+# Function that open the file of the search when it is saved, the rows are appended at each check point.
+  def _openFile(self, resume=False):
+    self._writer = None
+    self._openManifest(resume)
+    if self.saveFile:
+      self._writer = Storage.TableWriter(os.path.join(os.getcwd(), f'{self.saveName}.{self.saveFormat}'),
+                                         self.saveFormat, append=resume)
+
+# Function that close the file of the search.
+  def _closeFile(self):
+    self._closeManifest()
+    if self._writer is not None:
+      self._writer.close()
+      logger.info(f"[Save]>> Saved in {self._writer.path}")
+      self._writer = None
 
 # Function to save the data
   def save(self, name, data):
@@ -269,5 +988,5 @@ class S2paperAPI():
       data.to_csv(os.path.join(os.getcwd(), f'{name}.csv'))
     except Exception as error:
       words = os.path.join(os.getcwd(), f'{name}.csv')
-      print(f"[Save]>> Error to save the data in {words}")
+      logger.error(f"[Save]>> Error to save the data in {words}")
       raise error
@@ -1,35 +1,115 @@
-import requests
 import json
-import multiprocessing as mp
+import logging
 import os
-import pandas as pd
-import re
-import ast
-from pathlib import Path
 
-
-from time import sleep, time
-
-
-# (Decorantor)
+from . import Cache
+from . import Json
+from . import Storage
+from .Client import S2client
+from .Metrics import timer
+from .Scheduler import errorText
+from .SearchScript import FIELDS
+from .Sync import SyncState
+
+
+logger = logging.getLogger(__name__)
+
+# The extraction of each field of a paper of the web, in the order of the dictionary of each paper.
+EXTRACT = {
+  "authors": lambda data: [author[0]['name'] for author in data.get('authors',[{'name':None},None])],
+  "id": lambda data: data.get('id',None),
+  "socialLinks": lambda data: data.get('socialLinks',None),
+  "title": lambda data: data.get('title',{'text':None})['text'],
+  "paperAbstract": lambda data: data.get('paperAbstract',{'text':None})['text'],
+  "year": lambda data: data.get('year',{'text':None})['text'],
+  "venue": lambda data: data.get('venue',{'text':None})['text'],
+  "citationContexts": lambda data: data.get('citationContexts',None),
+  "citationStats": lambda data: data.get('citationStats',None),
+  "sources": lambda data: data.get('sources',None),
+  "externalContentStats": lambda data: data.get('externalContentStats',None),
+  "journal": lambda data: data.get('journal',None),
+  "presentationUrls": lambda data: data.get('presentationUrls',None),
+  "links": lambda data: data.get('links',None),
+  "primaryPaperLink": lambda data: data.get('primaryPaperLink',None),
+  "alternatePaperLinks": lambda data: data.get('alternatePaperLinks',None),
+  "entities": lambda data: [author['name'] for author in data.get('entities',[{'name':None}])],
+  "entityRelations": lambda data: data.get('entityRelations',None),
+  "blogs": lambda data: data.get('blogs',None),
+  "videos": lambda data: data.get('videos',None),
+  "githubReferences": lambda data: data.get('githubReferences',None),
+  "scorecardStats": lambda data: data.get('scorecardStats',None),
+  "fieldsOfStudy": lambda data: data.get('fieldsOfStudy',None),
+  "pubDate": lambda data: data.get('pubDate',None),
+  "pubUpdateDate": lambda data: data.get('pubUpdateDate',None),
+  "badges": lambda data: data.get('badges',None),
+  "tldr": lambda data: data.get('tldr',None),
+}
+
+# The fields of a paper of the web, all of them by default.
+WEB_FIELDS = list(EXTRACT)
+
+# The maximum papers of a page of the search of the web, the sizes are multiples of 10.
+MAX_PAGE_SIZE = 100
+
+
+# (Function)
 # - Description:
-#     Function that times the execution of other functions
+#     Split the papers from the position `start` to `end` in the fewest pages of the web:
+#     a page of size s starts at a multiple of s, so at each position the largest size
+#     that fits is used, and the last papers in the smallest page that holds them.
 # - Return:
-#     Print the time consuming of a function
+#     A list of batches `(pageSize, pages)`, the pages numbered from 1 in their size.
 #
-def timer(fun):
-  def warper(*args, **kwargs):
-    start = time()
-    d = fun(*args, **kwargs)
-    end = time()
-    print(f"[{fun.__name__}]>> Took {round(end-start,2)}s")
-    return d
-  return warper
-
-
-
-
-class S2paperWeb():
+def pagePlan(start, end, maxSize=MAX_PAGE_SIZE, step=10):
+  plan = {}
+  while start < end:
+    sizes = [size for size in range(step, maxSize + 1, step) if start % size == 0]
+    fits = [size for size in sizes if size <= end - start]
+    size = fits[-1] if len(fits) == len(sizes) else min(size for size in sizes if size >= end - start)
+    plan.setdefault(size, []).append(start // size + 1)
+    start += size
+  return sorted(plan.items(), reverse=True)
+
+
+# (Function)
+# - Description:
+#     Turn the pages extracted of the web (`.all['Results']` or the lines of a
+#     .jsonl file) in one table with the columns of S2paperAPI, built by column
+#     for all the papers at once, the fields not extracted are missing. The `citationStats` are flattened in the counts,
+#     the authors are kept as `{"authorId": None, "name": ...}` (the web extract
+#     keeps only the names) and `isOpenAccess` comes from the badges.
+# - Return:
+#     A pandas DataFrame with the columns of `FIELDS`, the counts and the year as
+#     nullable integers.
+#
+def webFrame(pages):
+  import pandas as pd
+
+  papers = [paper for page in pages for paper in page["Page"]["Papers"]]
+  frame = pd.DataFrame.from_records(papers, columns=["id", "title", "paperAbstract", "badges", "fieldsOfStudy",
+                                                     "venue", "year", "citationStats", "authors"])
+  stats = pd.DataFrame.from_records([value if isinstance(value, dict) else {} for value in frame["citationStats"]], index=frame.index,
+                                    columns=["numReferences", "numCitations", "numKeyCitations"])
+  badges = frame["badges"].map(lambda value: any(badge.get("id") == "OPEN_ACCESS" for badge in value) if isinstance(value, list) else None)
+
+  table = pd.DataFrame({
+    "paperId": frame["id"],
+    "title": frame["title"],
+    "abstract": frame["paperAbstract"],
+    "isOpenAccess": badges.astype("boolean"),
+    "fieldsOfStudy": frame["fieldsOfStudy"],
+    "url": "https://www.semanticscholar.org/paper/" + frame["id"].astype("string"),
+    "venue": frame["venue"],
+    "year": pd.to_numeric(frame["year"], errors="coerce").astype("Int64"),
+    "referenceCount": stats["numReferences"].astype("Int64"),
+    "citationCount": stats["numCitations"].astype("Int64"),
+    "influentialCitationCount": stats["numKeyCitations"].astype("Int64"),
+    "authors": frame["authors"].map(lambda names: [{"authorId": None, "name": name} for name in names] if isinstance(names, list) else None),
+  })
+  return table[FIELDS]
+
+
+class S2paperWeb(S2client):
   """
   Description
   ~~~~~~~~~~~~~~~~~~~~~
@@ -40,11 +120,35 @@ class S2paperWeb():
   Parameters
   ~~~~~~~~~~~~~~~~~~~~~
 
-  `S2paperWeb(poolCPU = 4, sleeptry = 5)`:
+  `S2paperWeb(poolCPU = 4, sleeptry = 5, executor = "thread", transport = None, limiter = None, scheduler = None, cache = None, memo = None, dedup = None, metrics = None)`:
     - `poolCPU : (int)` |
-          Number of cores of CPU to make multiples request in the same time.
+          Number of workers to make multiples request in the same time.
     - `sleeptry : (float)` |
-          Seconds to wait for try again when Semantic Scholar block the requests.
+          Seconds to wait for try again when Semantic Scholar block the requests without a Retry-After.
+    - `executor : (str | concurrent.futures.Executor)` |
+          The pool of workers, "thread", "process", "serial" or a Executor created by the user.
+          The pool is reused by all the calls of `.get()` until `.close()`.
+    - `transport : (Transport)` |
+          The HTTP layer, a `Transport(poolSize, timeout, compress, headers)`. The default keeps the connections
+          alive and ask compressed responses.
+    - `limiter : (RateLimiter)` |
+          The rate limiter shared by all the workers, the default is `RateLimiter(rate = poolCPU, burst = poolCPU, pause = sleeptry)`.
+          It slow down when Semantic Scholar answer 429 and ramp up again when the errors stop.
+    - `scheduler : (Scheduler)` |
+          The retry policy of the pages that fail, the default is `Scheduler(retries = 5, backoff = 1, maxBackoff = 60)`.
+          The pages given up are in `.badcalls`.
+    - `cache : (ResponseCache)` |
+          A persistent cache of the responses, the same request is not made again while it is valid.
+          The default is None, no cache.
+    - `memo : (PageMemo)` |
+          A in memory LRU of the pages already extracted, reused by the calls of `.get()` that overlap.
+          The default is None.
+    - `dedup : (PaperIndex)` |
+          A index of the ids already returned, the repeated papers are dropped of all the calls
+          while the index is kept. The default is None, the papers are not deduplicated.
+    - `metrics : (Metrics)` |
+          The measures of the requests, retries and phases, read in `.metrics`. The default is a new Metrics,
+          one can be shared by many instances.
 
   Example
   ~~~~~~~~~~~~~~~~~~~~~
@@ -58,12 +162,17 @@ class S2paperWeb():
    dict_keys(['authors', 'id', 'socialLinks', 'title', 'paperAbstract', 'year', 'venue', 'citationContexts', 'citationStats', 'sources', 'externalContentStats', 'journal', 'presentationUrls', 'links', 'primaryPaperLink', 'alternatePaperLinks', 'entities', 'entityRelations', 'blogs', 'videos', 'githubReferences', 'scorecardStats', 'fieldsOfStudy', 'pubDate', 'pubUpdateDate', 'badges', 'tldr'])
 
 """
-  def __init__(self, poolCPU = 4, sleeptry=5):
+  def __init__(self, poolCPU = 4, sleeptry=5, executor="thread", transport=None, limiter=None, scheduler=None, cache=None, memo=None, dedup=None, metrics=None):
+    super().__init__(poolCPU, executor, transport, limiter, scheduler, cache, memo, rate=poolCPU, pause=sleeptry, dedup=dedup, metrics=metrics)
     self.post = {}
+    self._fields = WEB_FIELDS
     self.sleeptry = sleeptry
-    self.poolCPU = poolCPU
     self.badcall = []
     self._start = True
+    self._end = None
+    self._aligned = False
+    self.totalResults = None
+    self.totalPages = None
     self._url = "https://www.semanticscholar.org/api/1/search"
     
   
@@ -83,11 +192,21 @@ class S2paperWeb():
     - `n : (int)` |
           The number of papers to get.
     - `save : (bool)` |
-          If true, will save the data set in a file csv at the current directory. the default is False.
+          If true, will write the pages in a file jsonl (one page by line) at the current directory,
+          read it with `.load_jsonl()`. the default is False.
     - `saveName : (str)` |
           The name of the file when the save is set True.
+    - `fsync : (bool)` |
+          If true, each check point of the saved file is synced to the disk. The default is False.
+    - `resume : (bool)` |
+          If true, continue a search saved that was stopped: only the pages missing or failed in the
+          manifest (./saveName.manifest) are requested and appended to the file. The default is False.
     - `page : (int)` |
           Where start to return of the papers, the default is 1, that is the first paper found.
+          The pages are of 10 papers, `page = 3` starts in the paper 20.
+    - `pageSize : (int)` |
+          The maximum papers requested by page, a multiple of 10. The first page is requested alone and tells
+          the total of the search, the others are planned in the fewest pages up to that total. The default is 100.
     - `sort : (str)` |
           The order of the return paper, the options are `("total-citations", "influence", "pub-date", "relevance")`.
           The default is "relevance".
@@ -117,15 +236,19 @@ class S2paperWeb():
     - `hydrateWithDdb : (bool)` |
           The defalt is `True`.
     - `includeTldrs : (bool)` |
-          AI based summary abstracts of papers. The defalt is `True`.
+          AI based summary abstracts of papers. The defalt is `True` when the field `"tldr"` is extracted.
     - `"tldrModelVersion" : (str)` |
           The AI version. The default is `"v2.0.0"`
     - `performTitleMatch: (bool)` |
           Match papers about title. The defalt is `True`.
     - `includeBadges: (bool)` |
-          Some bagdes about the papers. The defalt is `True`.
+          Some bagdes about the papers. The defalt is `True` when the field `"badges"` is extracted.
     - `getQuerySuggestions: (bool)` |
           Some query suggestions. The defalt is `True`.
+    - `fields : list(str)` |
+          The fields extracted of each paper, the others are never kept in memory or in the file. The default
+          are all the 27 fields, see `WEB_FIELDS`. When `"tldr"` or `"badges"` are not in the fields they are
+          not requested (`includeTldrs` and `includeBadges` are False).
     - `papers : list(int)` |
           A list of positions of the papers (0 is the first one), if pass a list, the parameters (n, offset)
           have no effect in the main query (search). The default is a empty list [].
@@ -133,13 +256,259 @@ class S2paperWeb():
     Returns
     ~~~~~~~~~~~~~~~~~~~~~
         When the parameter (save) is False, the data set found will be in the (.all) variable as a dictionary
-        in the class instantiated.
+        in the class instantiated, else in the file ./saveName.jsonl.
     """
     
+    batches = self._plan(search, n, page, pages, save, **kwargs)
+    
+    logger.info(f"[get]>> Searching... {self.post['queryString']!r}")
+
+    pool = self._pool()
+    self._openFile(kwargs.get('fsync', False), kwargs.get('resume', False))
+    try:
+      for pageSize, self._pages in batches:
+        self.post["pageSize"] = pageSize
+        self._runtime(pool, self._pages)
+    finally:
+      self._closeFile()
+    self.all["Results"].sort(key=lambda page: page['Page']['N_Page'])
+
+  # Iterator over the pages of a search, with a bounded number of pages in memory.
+  def iter_pages(self, search="Machine Learning+Deep Learning", n = 10, page = 1, pages = [], buffer = None, **kwargs):
+    """
+    .iter_pages()
+    ~~~~~~~~~~~~~~~~~~~~~
+    
+    `for page in S2paperWeb().iter_pages(search, n = 10, page = 1, pages = [], buffer = None, **kwargs)`
+    
+    Yield each page as `{"Page": {"N_Page", "N_Papers", "Papers"}}` as soon as it arrives (not in the page
+    order), without keeping them in `.all`. The parameters are the same of `.get()`, and:
+
+    - `buffer : (int)` |
+          Maximum pages requested or waiting to be consumed at the same time, the default is `poolCPU`.
+          The memory used does not grow with `n`.
+    """
+    batches = self._plan(search, n, page, pages, False, **kwargs)
+    pool = self._pool()
+
+    badcalls = []
+    for pageSize, pages in batches:
+      self.post["pageSize"] = pageSize
+      hits, pages = self._recall(pages)
+      for totals, data in hits.values():
+        self._totals(totals)
+        yield self._unique(data)
+
+      for (totals, data), page, _ in self._schedule(pool, self._query, pages, buffer or self.poolCPU, badcalls, self._fatal):
+        self._totals(totals)
+        self._memoize(page, (totals, data))
+        yield self._unique(data)
+
+    self._saveBadcalls(badcalls)
+
+  # Iterator over the papers of a search, with a bounded number of pages in memory.
+  def iter_papers(self, search="Machine Learning+Deep Learning", n = 10, page = 1, pages = [], buffer = None, **kwargs):
+    """
+    .iter_papers()
+    ~~~~~~~~~~~~~~~~~~~~~
+    
+    `for paper in S2paperWeb().iter_papers(search, n = 10, page = 1, pages = [], buffer = None, **kwargs)`
+    
+    Yield each paper as the dictionary extracted, the parameters are the same of `.iter_pages()`.
+    """
+    for data in self.iter_pages(search, n, page, pages, buffer, **kwargs):
+      yield from data["Page"]["Papers"]
+
+  # Function to get only the papers of a search that are not known by the previous syncs.
+  @timer
+  def sync(self, search="Machine Learning+Deep Learning", store="./S2sync.sqlite", maxPages=None, save=False, **kwargs):
+    """
+    .sync()
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    `S2paperWeb().sync(search, store = "./S2sync.sqlite", maxPages = None, save = False, **kwargs)`
+
+    Get the papers of a search that were not returned by the previous syncs of the same search.
+    The pages are requested by publication date (`sort = "pub-date"`), the first one alone and
+    the next ones `poolCPU` at a time, and the sync stops at the first page where all the papers
+    are known. So a daily refresh costs a request by page of new papers, not by page of the search.
+
+    Parameters
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    - `store : (str or SyncState)` |
+          The SQLite file (or a SyncState) where the ids and the newest `pubDate` of each search are kept.
+          The default is "./S2sync.sqlite".
+    - `maxPages : (int)` |
+          Maximum pages (of `pageSize` papers, 100 by default) requested, the default is all the pages of the search
+          (the first sync requests all of them).
+    - `save : (bool)` |
+          If true, the pages of the new papers are appended to ./saveName.jsonl.
+
+    The other parameters are the filters and the `fields` of `.get()`, the fields "id" and "pubDate"
+    are always extracted. When a page fails (see `.badcalls`) neither the state nor the file are
+    changed, and the next sync requests the same papers again.
+
+    Returns
+    ~~~~~~~~~~~~~~~~~~~~~
+
+        The pages of the new papers in (.all), as in `.get()`, and the number of new papers in (.new).
+
+    Example
+    ~~~~~~~~~~~~~~~~~~~~~
+
+     >>> m = S2paperWeb()
+     >>> m.sync("graph neural networks", save=True)    # every day
+     >>> m.new
+     37
+    """
+    fields = list(kwargs.get('fields', WEB_FIELDS))
+    kwargs = dict(kwargs, sort="pub-date", fields=fields + [field for field in ("id", "pubDate") if field not in fields])
+    self._plan(search, 10, 1, [], save, **kwargs)
+    self._end = None
+    self.post["pageSize"] = self._pageSize
+    state = store if isinstance(store, SyncState) else SyncState(store)
+    job = self._syncKey()
+    pool = self._pool()
+
+    found, ids, newest = [], [], None
+    badcalls = []
+    page, last, done = 1, maxPages, False
+    try:
+      while not done and (last is None or page <= last):
+        end = page + 1 if page == 1 else page + self.poolCPU
+        wave = list(range(page, end if last is None else min(end, last + 1)))
+        results = {n: data for data, n, _ in self._schedule(pool, self._query, wave, self.poolCPU, badcalls, self._fatal)}
+
+        for n in wave:
+          if n not in results:
+            done = True
+            break
+          totals, data = results[n]
+          if n == 1:
+            self._totals(totals)
+            last = totals["totalPages"] or 0
+            last = last if maxPages is None else min(maxPages, last)
+          papers = data["Page"]["Papers"]
+          known = state.known(job, [paper.get("id") for paper in papers]).union(ids)
+          new = [paper for paper in papers if paper.get("id") is not None and paper["id"] not in known]
+          if len(new) == 0:
+            done = True
+            break
+          found.append({"Page": dict(data["Page"], N_Papers=len(new), Papers=new)})
+          ids.extend(paper["id"] for paper in new)
+          dates = [paper["pubDate"] for paper in new if paper.get("pubDate")]
+          newest = max(dates + ([newest] if newest else []), default=None)
+        page = wave[-1] + 1
+
+      if len(badcalls) != 0:
+        self._saveBadcalls(badcalls)
+        logger.warning("[sync]>> Some pages failed, the state and the file are not changed.")
+      else:
+        if self.saveFile and len(found) != 0:
+          with Storage.JsonlWriter(f'./{self.saveName}.jsonl', fsync=kwargs.get('fsync', False)) as writer, self.metrics.time("save"):
+            writer.writeMany(found)
+          logger.info(f"[Save]>> Saved in {writer.path}")
+        state.commit(job, search, ids, newest)
+    finally:
+      if state is not store:
+        state.close()
+
+    logger.info(f"[sync]>> {len(ids)} new papers in {page - 1} pages.")
+    self.all = {"Results": found}
+    self.new = len(ids)
+    """
+    The number of new papers found by the last sync.
+    """
+
+  # The async version of get, all the pages are requested in the same event loop.
+  async def aget(self, search="Machine Learning+Deep Learning", n = 10, page = 1, pages = [], save = False, concurrency = 100, **kwargs):
+    """
+    .aget()
+    ~~~~~~~~~~~~~~~~~~~~~
+    
+    `await S2paperWeb().aget(search, n = 10, page = 1, pages = [], save = False, concurrency = 100, **kwargs)`
+    
+    The same parameters (`resume` included) and result of `.get()`, but the pages are requested with aiohttp
+    in a single event loop instead of a pool of processes.
+
+    - `concurrency : (int)` |
+          Maximum number of pages requested at the same time. The default is 100.
+    
+    Example
+    ~~~~~~~~~~~~~~~~~~~~~
+    
+     >>> import asyncio
+     >>> m = S2paperWeb()
+     >>> asyncio.run(m.aget("artificial intelligence", n=50))
+     >>> len(m.all['Results'])
+     5
+    """
+    check_point = [page async for page in self._apages(search, n, page, pages, save, concurrency, **kwargs)]
+    check_point.sort(key=lambda page: page['Page']['N_Page'])
+
+    if self.saveFile:
+      self._openFile(kwargs.get('fsync', False), kwargs.get('resume', False))
+      try:
+        self._writer.writeMany(check_point)
+        self._markWritten(self._writer.path)
+      finally:
+        self._closeFile()
+    else:
+      self.all["Results"].extend(check_point)
+
+  # Async iterator over the pages of a search, for `async for`.
+  async def aiter_pages(self, search="Machine Learning+Deep Learning", n = 10, page = 1, pages = [], concurrency = 100, **kwargs):
+    """
+    .aiter_pages()
+    ~~~~~~~~~~~~~~~~~~~~~
+    
+    `async for page in S2paperWeb().aiter_pages(search, n = 10, page = 1, pages = [], concurrency = 100, **kwargs)`
+    
+    Yield each page as `{"Page": {"N_Page", "N_Papers", "Papers"}}` as soon as it arrives (not in the page order).
+    The parameters are the same of `.aget()`.
+    """
+    async for data in self._apages(search, n, page, pages, False, concurrency, **kwargs):
+      yield data
+
+# The async engine, yield the extracted pages that have success.
+  async def _apages(self, search, n, page, pages, save, concurrency, **kwargs):
+    batches = self._plan(search, n, page, pages, save, **kwargs)
+    # The manifest is cleared (or resumed) like in .get(), the pages are marked done by .aget() once written.
+    self._openManifest(kwargs.get('resume', False))
+    self._written = []
+
+    from . import AsyncScript
+
+    badcalls = []
+    async with AsyncScript.session(concurrency, self.transport) as session:
+      for pageSize, pages in batches:
+        self.post["pageSize"] = pageSize
+        hits, pages = self._recall(self._pending(pages))
+        for page, (totals, data) in hits.items():
+          self._totals(totals)
+          self._written.append((self._jobKey(), page))
+          yield self._unique(data)
+
+        async for (totals, data), page, code in AsyncScript.runPages(lambda page: self._aquery(session, page), pages,
+                                                                     concurrency, self.scheduler, badcalls, self._fatal, self.metrics):
+          self._totals(totals)
+          self._memoize(page, (totals, data))
+          self._written.append((self._jobKey(), page))
+          yield self._unique(data)
+
+    self._saveBadcalls(badcalls)
+
+# Function that set the state of a search and split it in batches of (pageSize, pages) to request.
+  def _plan(self, search, n, page, pages, save, **kwargs):
     self.saveName = kwargs.get('saveName', "Data")
 
     self.saveFile = save
     self._search = search
+    self._fields = list(kwargs.get('fields', WEB_FIELDS))
+    unknown = [field for field in self._fields if field not in EXTRACT]
+    if len(unknown) != 0:
+      raise ValueError(f"[fields]>> Unknown fields {unknown}, the options are {WEB_FIELDS}.")
     
     self._sort = kwargs.get('sort', "relevance")
     self._authors = kwargs.get('authors', [])
@@ -152,9 +521,9 @@ class S2paperWeb():
     self._useFallbackRankerService = kwargs.get('useFallbackRankerService', False)
     self._useFallbackSearchCluster = kwargs.get('useFallbackSearchCluster', False)
     self._hydrateWithDdb = kwargs.get('hydrateWithDdb', True)
-    self._includeTldrs = kwargs.get('includeTldrs', True)
+    self._includeTldrs = kwargs.get('includeTldrs', 'tldr' in self._fields)
     self._performTitleMatch = kwargs.get('performTitleMatch', True)
-    self._includeBadges = kwargs.get('includeBadges', True)
+    self._includeBadges = kwargs.get('includeBadges', 'badges' in self._fields)
     self._tldrModelVersion = kwargs.get('tldrModelVersion', 'v2.0.0')
     self._getQuerySuggestions = kwargs.get('getQuerySuggestions', True)
     
@@ -182,207 +551,172 @@ class S2paperWeb():
      "useS2FosFields": True
     }
     
-    self._pages = pages
     self.n = n
     self._page = page
-    self.totalResults = 1000000000000000000000
-    self.post["pageSize"] = 10
+    self._pageSize = kwargs.get('pageSize', MAX_PAGE_SIZE)
+    if not isinstance(self._pageSize, int) or self._pageSize < 10 or self._pageSize % 10 != 0:
+      raise ValueError(f"[pageSize]>> The pageSize must be a positive multiple of 10, not {self._pageSize!r}.")
+    self._start = True
+    self._probed = False
+    self.totalResults = None
+    self.totalPages = None
+    """
+    The totals of the last search, told by the first page returned.
+    """
+    self.badcalls = []
     self.post["page"] = page
     self.all = {"Results": []}
-    
-    # print('.post >>')
-    # print(self.post)
-    print("\n")
-    print("Searching...")
 
-    with mp.Pool(self.poolCPU) as pool:
-      if self.n > 10:
-    
-        if len(pages) != 0:
-          self._pages = pages
-        else:  
-          self._pages = list(range(self._page, (self.n//10)+self._page))
-        self._runtime(pool, self._pages)
-          
-        if n%10>0:
-          self._pages = [self.n//10+self._page]
-          self.post["pageSize"] = self.n%10
-
-          self._runtime(pool, self._pages)
-          
-      else:
-        self._pages = [self._page]
-        self.post["page"] = self._page
-        self.post["pageSize"] = self.n
-
-        self._runtime(pool, self._pages)
-        
-    if self.saveFile:
-        words = os.path.join(os.getcwd(), f'{self.saveName}')
-        print(f"[Save]>> Saved in {words}.json")
+    # The pages of 10 papers asked, requested as they are.
+    if len(pages) != 0:
+      self._end = None
+      return [(10, pages)]
+
+    # With a memo the pages requested are the full pages of pageSize, the same for all the windows of
+    # the search, and they are cut to the window of the search once parsed.
+    start = (page - 1)*10
+    self._end = start + self.n
+    self._aligned = self.memo is not None
+    return self._batches(start - start % self._pageSize if self._aligned else start)
+
+# The batches of (pageSize, pages) of a search: the first page alone, that tells the total of the search,
+# then the other pages in the largest sizes, up to the total. When the first page fails the total is
+# unknown and the other pages are not requested.
+  def _batches(self, start):
+    plan = self._pagePlan(start, self._end)
+    if len(plan) == 0:
+      return
+    size, first = next((size, page) for size, pages in plan for page in pages if (page - 1)*size == start)
+    yield size, [first]
+
+    if not self._probed and not self._done(first):
+      logger.warning("[_batches]>> The first page failed, the other pages of the search are not requested.")
+      return
+    if self.totalResults is not None:
+      self._end = min(self._end, self.totalResults)
+    yield from self._pagePlan(start + size, self._end)
+
+# The pages from the position start to end, with a memo the full pages of pageSize that hold them.
+  def _pagePlan(self, start, end):
+    if self._aligned:
+      end = -(-end // self._pageSize)*self._pageSize
+    return pagePlan(start, end, self._pageSize)
 
 # The main function called in get to execute a script to get the papers.
   @timer
   def _runtime(self, pool, pages):
-    self.totalPages = 0
-
-    find = False
-    closed = False
-    
-    while True:
-      if self.saveFile:
-        close = self._startFile(find)
-      
-      print('\n')
-      print('[_runtime]>> Start searching...')
-
-
-      if self.totalResults < self.n:
-        self.n = self.totalResults
-        pages = list(range(self._page, self.totalPages))
-      
-      try:
-        res = pool.map(self._query, pages)
-        
-        resultData = pd.DataFrame(res, columns=["Response", "Page", "Code"])
-        resultData.set_index("Page")
-        
-        if resultData.query("Code !=200").size == 0:
-          self._extract(pool, resultData.query("Code ==200"))
-          
-          if self.saveFile:
-            if close:
-              while not(closed):
-                closed = self._endFile()
-                find = True
-          break
-        
-        else:
-          find = False
-
-          if resultData.query("Code ==200").size != 0:
-            self._extract(pool, resultData.query("Code ==200"))
-            
-            if self.saveFile:
-              if close:
-                while not(closed):
-                  closed = self._endFile()
-                  find = True
-              
-          print("Bad call of pages:")
-          pages = resultData.query("Code !=200")["Page"].values.tolist()
-          print(pages)
-
-          
-          err = resultData.query("Code !=200")["Response"].tolist()
-          err = [eval(x.text) for x in err]
-          print('Errors: ')
-          print(err)
-          
-          if self.saveFile:
-            try:
-              with open("./BadCalls.text", 'w', encoding='UTF-8') as fp:
-                fp.write(str(pages))
-            except Exception:
-              print("Fail to save badcalls.")
-          else:
-            self.badcalls = pages 
-          
-          if "Attempted to page beyond available results" in err[0]['error']:
-            break
-
-          print(f"Trying again in {round(self.sleeptry/60, 2)} min...")
-          sleep(self.sleeptry)
-
-      except Exception:
-        print("[_runtime]>> Error... Trying again")
-        print(f"Trying again in {round(self.sleeptry/60, 2)} min...")
-        sleep(self.sleeptry)
-        pass
-      print("---")
+    logger.info('[_runtime]>> Start searching...')
+
+    badcalls = []
+    attempts = {}
+    hits, pages = self._recall(self._pending(pages))
+    if len(hits) != 0:
+      self._extract([], hits)
+
+    # The pages are extracted and saved in check points of poolCPU pages, as they arrive.
+    res = []
+    for page in self._schedule(pool, self._query, pages, self.poolCPU, badcalls, self._fatal, attempts):
+      res.append(page)
+      if len(res) == self.poolCPU:
+        self._extract(res, attempts=attempts)
+        res = []
+    if len(res) != 0:
+      self._extract(res, attempts=attempts)
+
+    self._saveBadcalls(badcalls)
   
   
   @timer
-  def _extract(self, pool, data):
+  def _extract(self, res, hits={}, attempts={}):
     try:
-      self.papers_text = pool.map(self._json, data['Response'].tolist())
-
-      if self._start:
-        print('\n ---')
-        print(f"Total Results: {self.papers_text[0]['totalResults']}")
-        print(f"Total Pages: {self.papers_text[0]['totalPages']}")
-        print(f"Query Suggestions: {self.papers_text[0]['querySuggestions']}")
-        print('--- \n')
-        self.totalPages = self.papers_text[0]['totalPages']
-        self.totalResults = self.papers_text[0]['totalResults']
-        self._start = False
-
-      print("[_extract] >> extracting relevant data.")
-      check_point= [{"Page": {"N_Page":page['query']['page'],
-                                   "N_Papers":len(page['results']),
-                                   "Papers": pool.map(self._paperExtract,
-                                                      page['results'])}} for page in self.papers_text]
+      logger.debug("[_extract] >> extracting relevant data.")
+      pages = {}
+      for page, (totals, data) in hits.items():
+        self._totals(totals)
+        pages[page] = data
+      for (totals, data), page, _ in res:
+        self._totals(totals)
+        pages[page] = data
+        self._memoize(page, (totals, data))
+      check_point= [self._unique(pages[page]) for page in sorted(pages)]
 
       if self.saveFile:
         try:
-          self._save(check_point)
+          with self.metrics.time("save"):
+            self._writer.writeMany(check_point)
+            self._writer.checkpoint()
+          self._mark(sorted(pages), "done", attempts, self._writer.path)
+          logger.info(f"[Save] >> Saving check_point at current directory, {self._writer.path}")
         except Exception as err:
-          print("_save >> [Fail] to save.")
+          logger.error("_save >> [Fail] to save.")
           raise err
       else:
         self.all["Results"].extend(check_point)
 
     except Exception as err:
-      print("_extract>> [Fail], see .badcall to reextract content.")
-      self.badcall.append(self.papers_text)
-      print(self.badcall)
+      logger.error("_extract>> [Fail], see .badcall to reextract content.")
+      self.badcall.append(res)
       raise err
   
-  def _query(self, page):
+# Function that read the totals of the search in the first page returned.
+  def _totals(self, page):
+    self._probed = True
+    if self._start and page['totalResults'] is not None:
+      logger.info(f"[_totals]>> Total Results: {page['totalResults']}, Total Pages: {page['totalPages']}, "
+                  f"Query Suggestions: {page['querySuggestions']}")
+      self.totalPages = page['totalPages']
+      self.totalResults = page['totalResults']
+      self._start = False
+
+# Function that extract the relevant data of one page of results, numbered as a page of 10 papers.
+  def _pageExtract(self, page, mapper=map):
+    return {"Page": {"N_Page":(page['query']['page'] - 1)*self.post['pageSize']//10 + 1,
+                     "N_Papers":len(page['results']),
+                     "Papers": list(mapper(self._paperExtract, page['results']))}}
+
+# Function that drop the papers of a page out of the window of the search, and the ones already returned by the id.
+  def _unique(self, data):
+    papers = data["Page"]["Papers"]
+    first = (data["Page"]["N_Page"] - 1)*10
+    if self._end is not None and (first < (self._page - 1)*10 or len(papers) > self._end - first):
+      papers = papers[max(0, (self._page - 1)*10 - first):max(0, self._end - first)]
+      data = {"Page": dict(data["Page"], N_Page=max(first, (self._page - 1)*10)//10 + 1, N_Papers=len(papers), Papers=papers)}
+    if self.dedup is None:
+      return data
+    mask = self.dedup.unique([paper.get("id") for paper in papers])
+    if all(mask):
+      return data
+    papers = [paper for paper, new in zip(papers, mask) if new]
+    return {"Page": dict(data["Page"], N_Papers=len(papers), Papers=papers)}
+
+# Function that tells the errors that are not solved trying again.
+  def _fatal(self, res, code):
+    return "Attempted to page beyond available results" in str(errorText(res))
+
+# The body of the request of one page.
+  def _pagePost(self, page):
     post = self.post.copy()
     post["page"] = page
-    try:
-      res = requests.post(self._url, json=post, timeout=15)
-      res.encoding = 'utf-8'
-      sleep(1)
-      return [res, page, res.status_code]
-    except Exception:
-      return [None, page, 400 ]
+    return post
+
+# The key of the request of one page.
+  def _pageKey(self, page):
+    return Cache.requestKey("POST", self._url, {"fields": ",".join(self._fields)}, self._pagePost(page))
+
+  def _query(self, page):
+    return self._fetch(page, self._parsePage, "POST", self._url, body=self._pagePost(page))
   
+  async def _aquery(self, session, page):
+    return await self._afetch(session, page, self._parsePage, "POST", self._url, body=self._pagePost(page))
+
   def _paperExtract(self, data):
-    p = {
-        "authors": [author[0]['name'] for author in data.get('authors',[{'name':None},None])],
-        "id": data.get('id',None),
-        "socialLinks": data.get('socialLinks',None),
-        "title": data.get('title',{'text':None})['text'],
-        "paperAbstract": data.get('paperAbstract',{'text':None})['text'],
-        "year": data.get('year',{'text':None})['text'],
-        "venue": data.get('venue',{'text':None})['text'],
-        "citationContexts":data.get('citationContexts',None),
-        "citationStats": data.get('citationStats',None),
-        "sources":data.get('sources',None),
-        "externalContentStats":data.get('externalContentStats',None),
-        "journal":data.get('journal',None),
-        "presentationUrls":data.get('presentationUrls',None),
-        "links": data.get('links',None),
-        "primaryPaperLink": data.get('primaryPaperLink',None),
-        "alternatePaperLinks": data.get('alternatePaperLinks',None),
-        "entities": [author['name'] for author in data.get('entities',[{'name':None}])],
-        "entityRelations": data.get('entityRelations',None),
-        "blogs":data.get('blogs',None),
-        "videos":data.get('videos',None),
-        "githubReferences": data.get('githubReferences',None),
-        "scorecardStats": data.get('scorecardStats',None),
-        "fieldsOfStudy":data.get('fieldsOfStudy',None),
-        "pubDate":data.get('pubDate',None),
-        "pubUpdateDate":data.get('pubUpdateDate',None),
-        "badges":data.get('badges',None),
-        "tldr":data.get('tldr',None)
-        }
-    return p
-
-  def _json(self, res):
-    return json.loads(res.text).copy()
+    return {field: EXTRACT[field](data) for field in self._fields}
+
+# Function that treat the body of a response, called in the worker: the totals of the search and the page extracted.
+  def _parsePage(self, text):
+    data = Json.loads(text)
+    totals = {key: data.get(key) for key in ("totalResults", "totalPages", "querySuggestions")}
+    return totals, self._pageExtract(data)
 
   def save(self, name, data):
     """
@@ -392,88 +726,71 @@ class S2paperWeb():
       with open(f'./{name}.json', 'w',encoding='UTF-8') as fp:
           json.dump(data, fp)
     except Exception as err:
-      print("[Save]>> Error to save the data.")
-    raise err
+      logger.error("[Save]>> Error to save the data.")
+      raise err
+
+  def load_jsonl(self, path):
+    """
+    Function that read lazily a .jsonl File saved by `.get(save=True)`, yield one page by line.
+
+     >>> for page in S2paperWeb().load_jsonl("./Data.jsonl"):
+     ...   print(page['Page']['N_Page'])
+    """
+    try:
+      yield from Storage.iter_jsonl(path)
+    except Exception as err:
+      logger.error(f"[load_jsonl]>> Error to load jsonl file: {err}")
+      raise err
   
+  def to_frame(self, pages=None):
+    """
+    The papers of the pages as a pandas DataFrame with the same columns of `S2paperAPI().all`,
+    built in one pass for all the pages. The default are the pages in `.all['Results']`, the
+    pages of a file saved can be passed with `.load_jsonl()`.
+
+     >>> m = S2paperWeb()
+     >>> m.get("artificial intelligence", n=50)
+     >>> m.to_frame().columns
+     Index(['paperId', 'title', 'abstract', 'isOpenAccess', 'fieldsOfStudy', 'url', 'venue', 'year',
+            'referenceCount', 'citationCount', 'influentialCitationCount', 'authors'], dtype='object')
+     >>> m.to_frame(m.load_jsonl("./Data.jsonl"))
+    """
+    return webFrame(self.all["Results"] if pages is None else pages)
+
   def load_json(self, path):
     """
-    Function that can load a json File as a dictionary.
+    Function that can load a json File as a dictionary, see `.load_jsonl()` for the files saved by `.get()`.
     """
     try:
       with open(f'{path}', 'r', encoding='UTF-8') as fp:
           return json.load(fp)
     except Exception as err:
-      print("[load_json]>> Error to load json file.")
-      print(err)
+      logger.error(f"[load_json]>> Error to load json file: {err}")
       raise err
-    
-  def _startFile(self, find):
-    jsonFile = Path(f"./{self.saveName}.json")
-    
-    if jsonFile.is_file():
-      if find:
-        try:
-          print(f"[_startFile] >> Loading ./{self.saveName}.json")
-          with open(f'./{self.saveName}.json', 'r',encoding='UTF-8') as f:
-            data = json.load(f)
-          print(f"[Create] >> Creating a ./{self.saveName}.text file to save data.")
-          with open(f'./{self.saveName}.text', 'w',encoding='UTF-8') as fp:
-            fp.write("{\"Results\": [")
-        
-          self._save(data['Results'])
-        except Exception:
-          print(f"[_startFile] >> Fail to load ./{self.saveName}.json")
-          try:
-            with open(f'./{self.saveName}.text', 'w', encoding='UTF-8') as fp:
-              fp.write("{\"Results\": [")
-          except Exception as err:
-            print("[Create] >> Fail")
-            raise err
-      else:
-        return False
-    else:
-      try:
-        print(f"[Create] >> Creating a ./{self.saveName}.text file to save data.")
-        with open(f'./{self.saveName}.text', 'w',encoding='UTF-8') as fp:
-          fp.write("{\"Results\": [")
-      except Exception as err:
-        print("[Create] >> Fail")
-        raise err
-    return True
-
-
-  def _save(self, check_point):
-    if str(check_point) == '[]' or str(check_point) == '[,]':
-      return _
-    else:
-      text = str(check_point)
-      text = re.sub('^\[', '', text)
-      text = re.sub('\]$', '', text)
 
-      
-      with open(f'./{self.saveName}.text', 'a', encoding='utf-8') as fp:
-        fp.write(text)
-      print(f"[Save] >> Saving check_point at current directory, ./{self.saveName}.text")
-      
+# The key of the job of the manifest, the post without the page.
+  def _jobKey(self):
+    return Cache.requestKey("POST", self._url, {"fields": ",".join(self._fields)}, {k: v for k, v in self.post.items() if k != 'page'})
 
-  def _endFile(self):
-    try:
-      with open(f'./{self.saveName}.text', 'a', encoding='UTF-8') as fp:
-        fp.write(']}')
-      
-      try:
-        with open(f'./{self.saveName}.text', 'r', encoding='UTF-8') as fp:
-          text = fp.read()
-          text_dict = ast.literal_eval(text)
-      
-        with open(f'./{self.saveName}.json', 'w', encoding='UTF-8') as fp:
-          json.dump(text_dict, fp)
-        print(f"[Close] >> Closed and save in ./{self.saveName}.json file the data.")
-      except Exception as err:
-        print(f"[Close] >> Fail to save the data ./{self.saveName}.json file.")
-        raise err
-      return True
-    except Exception as err: 
-      print('[Close] >> Fail')
-      print(err)
-      return False
+# The key of a search in the state of sync, the post without the page and the fields extracted.
+  def _syncKey(self):
+    skip = ('page', 'pageSize', 'includeTldrs', 'includeBadges')
+    return Cache.requestKey("POST", self._url, None, {k: v for k, v in self.post.items() if k not in skip})
+
+# Function that open the .jsonl file of the search when it is saved.
+  def _openFile(self, fsync, resume=False):
+    self._writer = None
+    self._openManifest(resume)
+    if self.saveFile:
+      # A new search creates the file again, a search resumed appends the pages missing.
+      self._writer = Storage.JsonlWriter(f'./{self.saveName}.jsonl', fsync=fsync, append=resume)
+      logger.info(f"[Create] >> {'Appending' if resume else 'Writing'} the data in ./{self.saveName}.jsonl file.")
+
+# Function that close the .jsonl file of the search.
+  def _closeFile(self):
+    self._closeManifest()
+    if self._writer is not None:
+      self._writer.close()
+      self._writer = None
+      words = os.path.join(os.getcwd(), f'{self.saveName}')
+      logger.info(f"[Save]>> Saved in {words}.jsonl")
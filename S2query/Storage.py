@@ -0,0 +1,237 @@
+import json
+import os
+
+from . import Json
+
+
+class JsonlWriter():
+  """
+  Description
+  ~~~~~~~~~~~~~~~~~~~~~
+    A append only JSON Lines file, one record (a page or a paper) by line. Each
+    write is O(1), the file is never read back or rewritten, and `.checkpoint()`
+    flush the records to the disk (with fsync when `fsync=True`) so a crash
+    loses at most the records after the last checkpoint.
+
+  Parameters
+  ~~~~~~~~~~~~~~~~~~~~~
+
+  `JsonlWriter(path, fsync = False, append = True)`:
+    - `path : (str)` |
+          The .jsonl file.
+    - `fsync : (bool)` |
+          If true, `.checkpoint()` waits the records to be written in the disk.
+    - `append : (bool)` |
+          If true, the records are appended when the file exists, else the file is created again.
+
+  Example
+  ~~~~~~~~~~~~~~~~~~~~~
+
+   >>> with JsonlWriter("./Data.jsonl") as fp:
+   ...   fp.write({"Page": {"N_Page": 1, "N_Papers": 0, "Papers": []}})
+   ...   fp.checkpoint()
+  """
+  def __init__(self, path, fsync=False, append=True):
+    self.path = path
+    self.fsync = fsync
+    self.count = 0
+    self._fp = open(path, 'a' if append else 'w', encoding='UTF-8')
+
+  def write(self, record):
+    """
+    Append one record as a line.
+    """
+    self._fp.write(Json.dumps(record) + "\n")
+    self.count += 1
+
+  def writeMany(self, records):
+    """
+    Append many records, one by line.
+    """
+    for record in records:
+      self.write(record)
+
+  def checkpoint(self):
+    """
+    Flush the records written, and sync them to the disk when `fsync=True`.
+    """
+    self._fp.flush()
+    if self.fsync:
+      os.fsync(self._fp.fileno())
+
+  def close(self):
+    if not self._fp.closed:
+      self.checkpoint()
+      self._fp.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+
+# (Generator)
+# - Description:
+#     Read a JSON Lines file one record at a time. A last line cut by a crash
+#     in the middle of a write is ignored.
+# - Return:
+#     Yield each record of the file.
+#
+def iter_jsonl(path):
+  with open(path, 'r', encoding='UTF-8') as fp:
+    line = fp.readline()
+    while line:
+      following = fp.readline()
+      if line.strip():
+        try:
+          yield Json.loads(line)
+        except json.JSONDecodeError:
+          if following or line.endswith("\n"):
+            raise
+      line = following
+
+
+# The types of the columns of the Semantic Scholar API, the other columns are saved as text.
+TYPES = {
+  "year": "Int64",
+  "citationCount": "Int64",
+  "referenceCount": "Int64",
+  "influentialCitationCount": "Int64",
+  "isOpenAccess": "boolean",
+}
+
+
+# (Function)
+# - Description:
+#     A value of a text column: the nested values (lists of authors, fields
+#     of study...) as JSON and the missing values kept missing.
+# - Return:
+#     A str or None.
+#
+def _text(value):
+  if value is None or isinstance(value, str):
+    return value
+  if isinstance(value, (list, dict)):
+    return json.dumps(value, ensure_ascii=False)
+  if value != value:
+    return None
+  return str(value)
+
+
+# (Function)
+# - Description:
+#     Give types to the columns of a page, the numbers as nullable integers and
+#     the other columns as text.
+# - Return:
+#     A new pandas DataFrame.
+#
+def typed(frame, columns=None):
+  import pandas as pd
+
+  frame = frame.reindex(columns=columns) if columns is not None else frame.copy()
+  for column in frame.columns:
+    kind = TYPES.get(column)
+    if kind == "Int64":
+      frame[column] = pd.to_numeric(frame[column], errors="coerce").astype(kind)
+    elif kind is not None:
+      frame[column] = frame[column].astype(kind)
+    else:
+      frame[column] = frame[column].map(_text).astype("string")
+  return frame
+
+
+# (Function)
+# - Description:
+#     The first free path of the parts of a file, `Data.parquet`, `Data.1.parquet`...
+# - Return:
+#     A str.
+#
+def nextPart(path):
+  stem, ext = os.path.splitext(path)
+  part = 0
+  while os.path.isfile(path):
+    part += 1
+    path = f"{stem}.{part}{ext}"
+  return path
+
+
+class TableWriter():
+  """
+  Description
+  ~~~~~~~~~~~~~~~~~~~~~
+    A incremental writer of the pages of S2paperAPI, each `.write()` append only the
+    new rows, so a check point costs O(new rows) and not a rewrite of the file.
+    The columns are typed (`year`, `citationCount`... as integers) and the schema is
+    fixed by the first page.
+
+  Parameters
+  ~~~~~~~~~~~~~~~~~~~~~
+
+  `TableWriter(path, format = "csv", append = False)`:
+    - `path : (str)` |
+          The file.
+    - `format : (str)` |
+          "csv", a compact csv without index appended line by line, or "parquet", a row group
+          by write (needs pyarrow, `pip install S2query[parquet]`).
+    - `append : (bool)` |
+          If true and the csv file exists, the rows are added to it, else the file is created again.
+          A parquet file can not be appended, so the rows go to the next free part, `Data.1.parquet`...
+  """
+  def __init__(self, path, format="csv", append=False):
+    if format not in ("csv", "parquet"):
+      raise ValueError(f"[TableWriter]>> Unknown format {format!r}, the options are 'csv' or 'parquet'.")
+
+    if append and format == "parquet":
+      path = nextPart(path)
+
+    self.path = path
+    self.format = format
+    self.rows = 0
+    self.columns = None
+    self._parquet = None
+    self._header = not (append and format == "csv" and os.path.isfile(path) and os.path.getsize(path) > 0)
+    if self._header and os.path.isfile(path):
+      os.remove(path)
+
+  def write(self, frame):
+    """
+    Append the rows of a DataFrame.
+    """
+    if len(frame) == 0:
+      return
+    if self.columns is None:
+      self.columns = list(frame.columns)
+    frame = typed(frame, self.columns)
+
+    if self.format == "csv":
+      frame.to_csv(self.path, mode='a', header=self._header, index=False)
+      self._header = False
+    else:
+      self._writeParquet(frame)
+    self.rows += len(frame)
+
+  def _writeParquet(self, frame):
+    try:
+      import pyarrow as pa
+      import pyarrow.parquet as pq
+    except ImportError as err:
+      raise ImportError("[TableWriter]>> The parquet format needs pyarrow, install it with `pip install S2query[parquet]`.") from err
+
+    if self._parquet is None:
+      table = pa.Table.from_pandas(frame, preserve_index=False)
+      self._parquet = pq.ParquetWriter(self.path, table.schema)
+    else:
+      table = pa.Table.from_pandas(frame, schema=self._parquet.schema, preserve_index=False)
+    self._parquet.write_table(table)
+
+  def close(self):
+    if self._parquet is not None:
+      self._parquet.close()
+      self._parquet = None
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
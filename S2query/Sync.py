@@ -0,0 +1,106 @@
+import sqlite3
+import threading
+from time import time
+
+
+class SyncState():
+  """
+  Description
+  ~~~~~~~~~~~~~~~~~~~~~
+    The state of the searches refreshed with `.sync()`, in a SQLite file: the ids of
+    the papers already harvested and the newest publication date seen by each query.
+    A query is a search with its fixed parameters, so the next `.sync()` of the same
+    query only requests and returns the papers that are not known.
+
+  Parameters
+  ~~~~~~~~~~~~~~~~~~~~~
+
+  `SyncState(path = "./S2sync.sqlite")`:
+    - `path : (str)` |
+          The SQLite file, shared by all the queries.
+
+  Example
+  ~~~~~~~~~~~~~~~~~~~~~
+
+   >>> from S2query import SyncState
+   >>> SyncState("./S2sync.sqlite").summary()
+   [{'job': '3f1c...', 'query': 'deep learning', 'newest': '2024-05-02', 'papers': 1210, 'runs': 12, 'updated': 1714646400.0}]
+  """
+  def __init__(self, path="./S2sync.sqlite"):
+    self.path = path
+    self._lock = threading.Lock()
+    self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+    self._db.execute("PRAGMA journal_mode=WAL")
+    self._db.execute("""CREATE TABLE IF NOT EXISTS queries (
+                          job TEXT PRIMARY KEY, query TEXT, newest TEXT, papers INTEGER, runs INTEGER, updated REAL)""")
+    self._db.execute("""CREATE TABLE IF NOT EXISTS papers (
+                          job TEXT, paperId TEXT, PRIMARY KEY (job, paperId)) WITHOUT ROWID""")
+
+  def known(self, job, ids):
+    """
+    The ids of the list `ids` already harvested by the query, as a set.
+    """
+    ids = list({id for id in ids if id is not None})
+    known = set()
+    with self._lock:
+      for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        marks = ",".join("?" * len(chunk))
+        known.update(row[0] for row in self._db.execute(f"SELECT paperId FROM papers WHERE job = ? AND paperId IN ({marks})",
+                                                        [job] + chunk))
+    return known
+
+  def newest(self, job):
+    """
+    The newest publication date seen by the query ("YYYY-MM-DD"), None before the first sync.
+    """
+    with self._lock:
+      row = self._db.execute("SELECT newest FROM queries WHERE job = ?", (job,)).fetchone()
+    return None if row is None else row[0]
+
+  def commit(self, job, query, ids, newest=None):
+    """
+    Add the ids of a sync to the query and keep the newest date, in one transaction.
+    """
+    with self._lock:
+      self._db.execute("BEGIN")
+      try:
+        self._db.executemany("INSERT OR IGNORE INTO papers VALUES (?, ?)", [(job, id) for id in ids if id is not None])
+        count = self._db.execute("SELECT COUNT(*) FROM papers WHERE job = ?", (job,)).fetchone()[0]
+        self._db.execute("""INSERT INTO queries VALUES (?, ?, ?, ?, 1, ?)
+                            ON CONFLICT (job) DO UPDATE SET query = excluded.query, papers = excluded.papers,
+                            runs = runs + 1, updated = excluded.updated,
+                            newest = CASE WHEN newest IS NULL OR excluded.newest > newest THEN excluded.newest ELSE newest END""",
+                         (job, query, newest, count, time()))
+        self._db.execute("COMMIT")
+      except Exception:
+        self._db.execute("ROLLBACK")
+        raise
+
+  def clear(self, job):
+    """
+    Forget a query, the next sync harvests it again from the start.
+    """
+    with self._lock:
+      self._db.execute("DELETE FROM papers WHERE job = ?", (job,))
+      self._db.execute("DELETE FROM queries WHERE job = ?", (job,))
+
+  def summary(self, job=None):
+    """
+    The queries (or a query) as a list of dictionaries.
+    """
+    query = "SELECT job, query, newest, papers, runs, updated FROM queries"
+    with self._lock:
+      rows = self._db.execute(query + " WHERE job = ?", (job,)) if job else self._db.execute(query)
+      keys = ["job", "query", "newest", "papers", "runs", "updated"]
+      return [dict(zip(keys, row)) for row in rows]
+
+  def close(self):
+    with self._lock:
+      self._db.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
@@ -0,0 +1,110 @@
+import threading
+import uuid
+
+
+# The sessions of each worker (thread) of this process, by transport key.
+_local = threading.local()
+# All the sessions opened in this process, by transport key, to close them.
+_opened = {}
+_lock = threading.Lock()
+
+
+# (Function)
+# - Description:
+#     The encodings that can be decompressed here, brotli is only asked when
+#     one of the brotli packages used by urllib3 is installed.
+# - Return:
+#     The value of the header Accept-Encoding.
+#
+def acceptEncoding():
+  for module in ("brotli", "brotlicffi"):
+    try:
+      __import__(module)
+      return "gzip, deflate, br"
+    except ImportError:
+      pass
+  return "gzip, deflate"
+
+
+class Transport():
+  """
+  Description
+  ~~~~~~~~~~~~~~~~~~~~~
+    The HTTP layer shared by the requests of a instance. Each worker (thread or
+    process) has its own `requests.Session`, so the connections are kept alive and
+    reused between the pages instead of a new TCP+TLS handshake for every request.
+
+  Parameters
+  ~~~~~~~~~~~~~~~~~~~~~
+
+  `Transport(poolSize = 10, timeout = 15, compress = True, headers = {})`:
+    - `poolSize : (int)` |
+          Number of connections kept alive by each session (by host).
+    - `timeout : (float)` |
+          Seconds to wait for the server.
+    - `compress : (bool)` |
+          Ask compressed responses (gzip, and brotli when installed).
+    - `headers : dict` |
+          Headers sent in all the requests, ex. `{"x-api-key": "..."}`.
+
+  Example
+  ~~~~~~~~~~~~~~~~~~~~~
+
+   >>> from S2query import S2paperAPI, Transport
+   >>> m = S2paperAPI(transport=Transport(poolSize=20, headers={"x-api-key": "..."}))
+  """
+  def __init__(self, poolSize=10, timeout=15, compress=True, headers={}):
+    self.poolSize = poolSize
+    self.timeout = timeout
+    self.headers = {"Connection": "keep-alive"}
+    if compress:
+      self.headers["Accept-Encoding"] = acceptEncoding()
+    self.headers.update(headers)
+    self._key = uuid.uuid4().hex
+
+  # Function that return the session of the current worker, creating it in the first call.
+  def session(self):
+    sessions = getattr(_local, "sessions", None)
+    if sessions is None:
+      sessions = _local.sessions = {}
+
+    session = sessions.get(self._key)
+    if session is None:
+      import requests
+      from requests.adapters import HTTPAdapter
+
+      session = requests.Session()
+      adapter = HTTPAdapter(pool_connections=self.poolSize, pool_maxsize=self.poolSize)
+      session.mount("https://", adapter)
+      session.mount("http://", adapter)
+      session.headers.update(self.headers)
+      sessions[self._key] = session
+      with _lock:
+        _opened.setdefault(self._key, []).append(session)
+    return session
+
+  def get(self, url, params=None):
+    """
+    Make a GET request, the `params` are encoded in the url by requests.
+    """
+    res = self.session().get(url, params=params, timeout=self.timeout)
+    res.encoding = 'utf-8'
+    return res
+
+  def post(self, url, json=None, params=None):
+    """
+    Make a POST request with a json body.
+    """
+    res = self.session().post(url, json=json, params=params, timeout=self.timeout)
+    res.encoding = 'utf-8'
+    return res
+
+  def close(self):
+    """
+    Close the sessions opened by the workers of this process.
+    """
+    getattr(_local, "sessions", {}).pop(self._key, None)
+    with _lock:
+      sessions = _opened.pop(self._key, [])
+    for session in sessions:
+      session.close()
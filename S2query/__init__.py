@@ -41,23 +41,57 @@ Search paper using the data provided by the page of Semantic Scholar: <https://w
 
 __docformat__ = "restructuredtext"
 
-# Let users know if they're missing any of our hard dependencies
-hard_dependencies = ("requests", "json", "multiprocessing", "pandas", "time", "os", "ast", "re", "pathlib")
-missing_dependencies = []
+import logging
+from importlib.util import find_spec
 
-for dependency in hard_dependencies:
-    try:
-        __import__(dependency)
-    except ImportError as e:
-        missing_dependencies.append(f"{dependency}: {e}")
+# Let users know if they're missing any of our hard dependencies, without importing them:
+# pandas is imported only when a DataFrame is built and requests in the first request.
+hard_dependencies = ("requests", "pandas")
+missing_dependencies = [dependency for dependency in hard_dependencies if find_spec(dependency) is None]
 
 if missing_dependencies:
     raise ImportError(
         "Unable to import required dependencies:\n" + "\n".join(missing_dependencies)
     )
-del hard_dependencies, dependency, missing_dependencies
+del hard_dependencies, missing_dependencies
 
+# The classes with the name of their module are imported now, else the import of the
+# module by the others would hide the class. These modules only need the standard library.
+from .Transport import Transport
+from .RateLimiter import RateLimiter
+from .Scheduler import Scheduler, BadCall
+from .Manifest import Manifest
+from .Metrics import Metrics
 
-from .SearchScript import S2paperAPI
-from .SearchWebScript import S2paperWeb
+# The other public names and their modules, imported in the first access (PEP 562).
+_LAZY = {
+    "S2paperAPI": "SearchScript",
+    "S2paperWeb": "SearchWebScript",
+    "S2paperGraph": "GraphScript",
+    "ResponseCache": "Cache",
+    "PageMemo": "Cache",
+    "PaperIndex": "Dedup",
+    "CompactResult": "Compact",
+    "SyncState": "Sync",
+}
 
+__all__ = list(_LAZY) + ["Transport", "RateLimiter", "Scheduler", "BadCall", "Manifest", "Metrics"]
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+
+    value = getattr(import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
+
+
+# The messages of the library are logged in "S2query", shown only when the application configures logging.
+logging.getLogger(__name__).addHandler(logging.NullHandler())
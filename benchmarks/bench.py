@@ -0,0 +1,162 @@
+"""
+Benchmarks of S2paperAPI.get and S2paperWeb.get against the local stand-in server of
+mockserver.py, without network. Each scenario (client, n, poolCPU) runs in its own process,
+so the peak RSS is of the scenario only, and is reported as one JSON line:
+
+   {"client": "api", "engine": "pool", "n": 5000, "poolCPU": 16, "seconds": 1.92, "pages": 50, "pagesPerSec": 26.04,
+    "p50Ms": 21.3, "p99Ms": 48.0, "peakRssMb": 98.1, "requests": 54, "retries": 4, "status": {...}, ...}
+
+Usage:
+
+   python benchmarks/bench.py --client api web --engine pool async --n 1000 5000 --pool 4 16 --latency 0.02 --p429 0.02 --out bench.jsonl
+
+The engine "pool" runs `.get()` with a thread pool of `--pool` workers, and "async" runs `.aget()`
+with `--pool` requests in flight, so both are compared with the same server and the same faults.
+
+The rate limiter is set to `--rate` requests by second (the default is high enough to measure
+the library, not the limiter) and the scheduler backoff to `--backoff` seconds.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mockserver import MockServer
+
+
+# (Function)
+# - Description:
+#     The percentile `q` (0 to 100) of a list of values.
+# - Return:
+#     A float, or None for a empty list.
+#
+def percentile(values, q):
+  if len(values) == 0:
+    return None
+  values = sorted(values)
+  return values[min(len(values) - 1, max(0, math.ceil(q / 100 * len(values)) - 1))]
+
+
+# (Function)
+# - Description:
+#     Run one scenario in the current process.
+# - Return:
+#     A dict with the measures of the client side.
+#
+def runScenario(config):
+  from S2query import S2paperAPI, S2paperWeb, Transport, RateLimiter, Scheduler
+
+  transport = Transport(poolSize=config["poolCPU"])
+  options = dict(poolCPU=config["poolCPU"], executor="thread", transport=transport,
+                 limiter=RateLimiter(config["rate"], burst=max(1, int(config["rate"]))),
+                 scheduler=Scheduler(retries=config["retries"], backoff=config["backoff"]))
+  if config["client"] == "api":
+    client = S2paperAPI(**options)
+    client._api = config["base"] + "/graph/v1/paper/search"
+  else:
+    client = S2paperWeb(**options)
+    client._url = config["base"] + "/api/1/search"
+
+  # The seconds of each request, of the pool or of the async engine.
+  latencies = []
+  client.metrics.subscribe(lambda event, data: event == "request" and latencies.append(data["seconds"]))
+
+  start = perf_counter()
+  if config["engine"] == "async":
+    asyncio.run(client.aget("benchmark", n=config["n"], concurrency=config["poolCPU"]))
+  else:
+    client.get("benchmark", n=config["n"])
+  seconds = perf_counter() - start
+  client.close()
+
+  # The pages are the ones planned by the client and returned, read in its metrics: each request
+  # is a page, a retry or a page given up (a truncated body is a 200 that is tried again).
+  metrics = client.metrics.snapshot()
+  pages = metrics["requests"] - metrics["retries"] - metrics["badcalls"]
+
+  if config["client"] == "api":
+    papers = len(client.all)
+  else:
+    papers = sum(page["Page"]["N_Papers"] for page in client.all["Results"])
+
+  p50, p99 = percentile(latencies, 50), percentile(latencies, 99)
+  return {"seconds": round(seconds, 4), "pages": pages, "papers": papers,
+          "pagesPerSec": round(pages / seconds, 2) if seconds > 0 else None,
+          "p50Ms": None if p50 is None else round(p50 * 1000, 2),
+          "p99Ms": None if p99 is None else round(p99 * 1000, 2),
+          "peakRssMb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+          "retries": metrics["retries"], "badcalls": len(client.badcalls)}
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmarks of S2query against a local stand-in server.")
+  parser.add_argument("--client", nargs="+", default=["api", "web"], choices=["api", "web"])
+  parser.add_argument("--n", nargs="+", type=int, default=[1000, 5000])
+  parser.add_argument("--pool", nargs="+", type=int, default=[4, 16], help="workers of the pool, or requests in flight of the async engine")
+  parser.add_argument("--engine", nargs="+", default=["pool", "async"], choices=["pool", "async"],
+                      help="`.get()` with the thread pool or `.aget()` (needs aiohttp)")
+  parser.add_argument("--repeat", type=int, default=1)
+  parser.add_argument("--latency", type=float, default=0.02, help="seconds by request of the server")
+  parser.add_argument("--p429", type=float, default=0)
+  parser.add_argument("--p5xx", type=float, default=0)
+  parser.add_argument("--ptruncated", type=float, default=0)
+  parser.add_argument("--rate", type=float, default=10000, help="requests by second of the rate limiter")
+  parser.add_argument("--backoff", type=float, default=0.05, help="seconds of the first retry")
+  parser.add_argument("--retries", type=int, default=5)
+  parser.add_argument("--seed", type=int, default=0)
+  parser.add_argument("--out", default=None, help="append the JSON lines to this file")
+  parser.add_argument("--scenario", default=None, help=argparse.SUPPRESS)
+  args = parser.parse_args()
+
+  if args.scenario is not None:
+    print(json.dumps(runScenario(json.loads(args.scenario))))
+    return
+
+  server = MockServer(total=10000, latency=args.latency, p429=args.p429, p5xx=args.p5xx,
+                      ptruncated=args.ptruncated, seed=args.seed)
+  base = server.start()
+  out = open(args.out, "a", encoding="utf-8") if args.out else None
+  try:
+    for client, engine in itertools.product(args.client, args.engine):
+      for n in args.n:
+        for poolCPU in args.pool:
+          for run in range(args.repeat):
+            config = {"client": client, "engine": engine, "n": n, "poolCPU": poolCPU, "base": base, "rate": args.rate,
+                      "backoff": args.backoff, "retries": args.retries}
+            server.reset()
+            child = subprocess.run([sys.executable, os.path.abspath(__file__), "--scenario", json.dumps(config)],
+                                   capture_output=True, text=True)
+            if child.returncode != 0:
+              sys.stderr.write(child.stderr)
+              raise SystemExit(f"The scenario {config} failed.")
+
+            result = json.loads(child.stdout.strip().splitlines()[-1])
+            stats = server.stats()
+            record = {"client": client, "engine": engine, "n": n, "poolCPU": poolCPU, "run": run, **result,
+                      "requests": stats["requests"],
+                      "status": stats["status"], "truncated": stats["truncated"], "bytes": stats["bytes"],
+                      "server": {"latency": args.latency, "p429": args.p429, "p5xx": args.p5xx, "ptruncated": args.ptruncated},
+                      "python": platform.python_version(), "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+            line = json.dumps(record)
+            print(line)
+            if out is not None:
+              out.write(line + "\n")
+              out.flush()
+  finally:
+    if out is not None:
+      out.close()
+    server.stop()
+
+
+if __name__ == "__main__":
+  main()
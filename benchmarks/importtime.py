@@ -0,0 +1,95 @@
+"""
+Benchmark of the time to import S2query, each statement runs `--repeat` times in a new
+interpreter, and is reported as one JSON line with the median and the heavy modules loaded:
+
+   {"statement": "from S2query import S2paperWeb", "medianMs": 21.4, "minMs": 20.8, "loaded": [], "ok": true}
+
+Usage:
+
+   python benchmarks/importtime.py --repeat 10 --max-ms 150
+
+The run fails (exit code 1) when a statement takes more than `--max-ms` milliseconds, or
+loads a module that it must not load: pandas is imported only when a DataFrame is built,
+and requests, asyncio and multiprocessing only when they are used.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The modules that are slow to import, checked after each statement.
+HEAVY = ("pandas", "numpy", "requests", "asyncio", "aiohttp", "pyarrow", "multiprocessing")
+
+# The statements measured, and the heavy modules that each one must not load.
+STATEMENTS = {
+  "import S2query": HEAVY,
+  "from S2query import S2paperWeb": HEAVY,
+  "from S2query import S2paperAPI": HEAVY,
+  "from S2query import S2paperGraph": HEAVY,
+}
+
+CHILD = """
+import sys
+from time import perf_counter
+start = perf_counter()
+{statement}
+seconds = perf_counter() - start
+print(repr((seconds, [name for name in {heavy!r} if name in sys.modules])))
+"""
+
+
+# (Function)
+# - Description:
+#     Run the statement in a new interpreter, with the package of this repository.
+# - Return:
+#     A tuple (seconds, heavy modules loaded).
+#
+def measure(statement):
+  env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+  child = subprocess.run([sys.executable, "-c", CHILD.format(statement=statement, heavy=HEAVY)],
+                         capture_output=True, text=True, env=env, cwd=ROOT)
+  if child.returncode != 0:
+    sys.stderr.write(child.stderr)
+    raise SystemExit(f"The statement {statement!r} failed.")
+  return eval(child.stdout.strip().splitlines()[-1])
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmark of the time to import S2query.")
+  parser.add_argument("--repeat", type=int, default=5)
+  parser.add_argument("--max-ms", type=float, default=None, help="fail when the median of a statement is slower")
+  parser.add_argument("--out", default=None, help="append the JSON lines to this file")
+  args = parser.parse_args()
+
+  ok = True
+  out = open(args.out, "a", encoding="utf-8") if args.out else None
+  try:
+    # The first run compiles the bytecode, it is not measured.
+    measure("import S2query.SearchScript, S2query.SearchWebScript, S2query.GraphScript")
+    for statement, forbidden in STATEMENTS.items():
+      runs = [measure(statement) for _ in range(args.repeat)]
+      times = [seconds * 1000 for seconds, _ in runs]
+      loaded = sorted({name for _, names in runs for name in names})
+      median = statistics.median(times)
+      passed = (args.max_ms is None or median <= args.max_ms) and not set(loaded) & set(forbidden)
+      ok = ok and passed
+      line = json.dumps({"statement": statement, "medianMs": round(median, 2), "minMs": round(min(times), 2),
+                         "loaded": loaded, "ok": passed})
+      print(line)
+      if out is not None:
+        out.write(line + "\n")
+  finally:
+    if out is not None:
+      out.close()
+
+  if not ok:
+    raise SystemExit(1)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,208 @@
+"""
+A local stand-in of Semantic Scholar for the benchmarks, it answers the search of the
+API (`GET /graph/v1/paper/search`) and of the web (`POST /api/1/search`) with generated
+papers, and can inject latency, 429, 5xx and truncated bodies.
+
+   >>> server = MockServer(latency=0.02, p429=0.05)
+   >>> base = server.start()
+   >>> server.stats()
+   {'requests': 0, 'status': {}, 'truncated': 0, 'bytes': 0}
+   >>> server.stop()
+
+Run alone to serve until Ctrl+C: `python benchmarks/mockserver.py --port 8080 --latency 0.05`.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+# (Function)
+# - Description:
+#     A paper of the API, the same for the same position.
+# - Return:
+#     A dict.
+#
+def apiPaper(i):
+  return {"paperId": f"{i:040x}", "title": f"Paper {i}", "abstract": "An abstract " * 20,
+          "isOpenAccess": i % 3 == 0, "fieldsOfStudy": ["Computer Science"], "url": f"https://www.semanticscholar.org/paper/{i:040x}",
+          "venue": f"Venue {i % 50}", "year": 1990 + i % 33, "referenceCount": i % 70, "citationCount": i % 1000,
+          "influentialCitationCount": i % 10, "authors": [{"authorId": str(i * 3 + k), "name": f"Author {i * 3 + k}"} for k in range(3)]}
+
+
+# (Function)
+# - Description:
+#     A paper of the web search, the same for the same position.
+# - Return:
+#     A dict.
+#
+def webPaper(i):
+  return {"id": f"{i:040x}", "title": {"text": f"Paper {i}"}, "paperAbstract": {"text": "An abstract " * 20},
+          "year": {"text": str(1990 + i % 33)}, "venue": {"text": f"Venue {i % 50}"},
+          "authors": [[{"name": f"Author {i * 3 + k}", "ids": [str(i * 3 + k)]}, {}] for k in range(3)],
+          "citationStats": {"numCitations": i % 1000, "numKeyCitations": i % 10, "numReferences": i % 70},
+          "fieldsOfStudy": ["Computer Science"], "pubDate": "2020-01-01", "entities": [{"name": "Deep learning"}],
+          "citationContexts": [{"text": "context " * 30}] * 3, "badges": [{"id": "OPEN_ACCESS"}] if i % 3 == 0 else [],
+          "tldr": {"text": "A summary " * 5}}
+
+
+class MockServer():
+  """
+  Description
+  ~~~~~~~~~~~~~~~~~~~~~
+    A threaded http server in the current process, with `total` papers by search.
+
+  Parameters
+  ~~~~~~~~~~~~~~~~~~~~~
+
+  `MockServer(total = 10000, latency = 0, jitter = 0.5, p429 = 0, p5xx = 0, ptruncated = 0, seed = 0, port = 0)`:
+    - `latency : (float)` |
+          Seconds to answer each request.
+    - `jitter : (float)` |
+          Fraction of the latency that is random.
+    - `p429, p5xx, ptruncated : (float)` |
+          Probability of each request answer 429 (with Retry-After 0), 503, or 200 with the body cut in half.
+    - `seed : (int)` |
+          The seed of the random errors, so the runs are repeatable.
+  """
+  def __init__(self, total=10000, latency=0, jitter=0.5, p429=0, p5xx=0, ptruncated=0, seed=0, port=0):
+    self.total = total
+    self.latency = latency
+    self.jitter = jitter
+    self.p429 = p429
+    self.p5xx = p5xx
+    self.ptruncated = ptruncated
+    self.port = port
+    self._random = random.Random(seed)
+    self._lock = threading.Lock()
+    self._server = None
+    self.reset()
+
+  def reset(self):
+    """
+    Clear the counters.
+    """
+    with self._lock:
+      self._stats = {"requests": 0, "status": {}, "truncated": 0, "bytes": 0}
+
+  def stats(self):
+    """
+    The counters of the requests: total, by status, truncated bodies and bytes sent.
+    """
+    with self._lock:
+      return json.loads(json.dumps(self._stats))
+
+  # Function that choose the fault of a request, None, 429, 503 or "truncated".
+  def _fault(self):
+    with self._lock:
+      draw = self._random.random()
+      wait = self.latency * (1 - self.jitter * self._random.random())
+    if draw < self.p429:
+      return 429, wait
+    if draw < self.p429 + self.p5xx:
+      return 503, wait
+    if draw < self.p429 + self.p5xx + self.ptruncated:
+      return "truncated", wait
+    return None, wait
+
+  def _count(self, code, size, truncated=False):
+    with self._lock:
+      self._stats["requests"] += 1
+      self._stats["status"][str(code)] = self._stats["status"].get(str(code), 0) + 1
+      self._stats["truncated"] += truncated
+      self._stats["bytes"] += size
+
+  def _handler(self):
+    server = self
+
+    class Handler(BaseHTTPRequestHandler):
+      protocol_version = "HTTP/1.1"
+
+      def log_message(self, *args):
+        pass
+
+      def _send(self, code, body, headers={}):
+        fault, wait = server._fault()
+        time.sleep(wait)
+        truncated = False
+        if fault in (429, 503):
+          code, body, headers = fault, {"message": "Too Many Requests" if fault == 429 else "Service Unavailable"}, {"Retry-After": "0"}
+        data = json.dumps(body).encode("utf-8")
+        if fault == "truncated" and code == 200:
+          data, truncated = data[:len(data)//2], True
+
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in headers.items():
+          self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+        server._count(code, len(data), truncated)
+
+      def do_GET(self):
+        url = urlparse(self.path)
+        if not url.path.endswith("/graph/v1/paper/search"):
+          return self._send(404, {"error": "Not found"})
+        query = parse_qs(url.query)
+        offset = int(query.get("offset", ["0"])[0])
+        limit = int(query.get("limit", ["100"])[0])
+        if offset + limit > 10000:
+          return self._send(400, {"error": "Requested data for this limit and/or offset is not available"})
+        end = min(offset + limit, server.total)
+        body = {"total": server.total, "offset": offset, "data": [apiPaper(i) for i in range(offset, end)]}
+        if end < server.total:
+          body["next"] = end
+        self._send(200, body)
+
+      def do_POST(self):
+        size = int(self.headers.get("Content-Length", 0))
+        post = json.loads(self.rfile.read(size) or b"{}")
+        if not urlparse(self.path).path.endswith("/api/1/search"):
+          return self._send(404, {"error": "Not found"})
+        page, pageSize = post.get("page", 1), post.get("pageSize", 10)
+        start = (page - 1) * pageSize
+        if start >= server.total:
+          return self._send(400, {"error": "Attempted to page beyond available results"})
+        results = [webPaper(i) for i in range(start, min(start + pageSize, server.total))]
+        self._send(200, {"results": results, "totalResults": server.total, "totalPages": -(-server.total // pageSize),
+                         "query": {"page": page}, "querySuggestions": []})
+
+    return Handler
+
+  def start(self):
+    """
+    Serve in a daemon thread, return the base url.
+    """
+    self._server = ThreadingHTTPServer(("127.0.0.1", self.port), self._handler())
+    self._server.daemon_threads = True
+    threading.Thread(target=self._server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+  def stop(self):
+    if self._server is not None:
+      self._server.shutdown()
+      self._server.server_close()
+      self._server = None
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Local stand-in of Semantic Scholar.")
+  parser.add_argument("--port", type=int, default=8080)
+  parser.add_argument("--total", type=int, default=10000)
+  parser.add_argument("--latency", type=float, default=0)
+  parser.add_argument("--p429", type=float, default=0)
+  parser.add_argument("--p5xx", type=float, default=0)
+  parser.add_argument("--ptruncated", type=float, default=0)
+  args = parser.parse_args()
+
+  server = MockServer(args.total, args.latency, p429=args.p429, p5xx=args.p5xx, ptruncated=args.ptruncated, port=args.port)
+  print(f"Serving at {server.start()}")
+  try:
+    while True:
+      time.sleep(1)
+  except KeyboardInterrupt:
+    server.stop()
@@ -24,6 +24,7 @@ setup(
     package_data={'S2query': ['VERSION']},
     # packages=['S2search'],
     install_requires=["requests", "pandas"],
+    extras_require={"async": ["aiohttp"], "parquet": ["pyarrow"], "fast": ["orjson"]},
     keywords=['python', 'Semantic Scholar', 'API', 'Papers', 'semantic-scholar', 'papers'],
     classifiers=[
         # "Development Status :: 2 - Pre-Alpha",
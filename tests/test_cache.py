@@ -0,0 +1,88 @@
+"""
+The ResponseCache against the local stand-in server of the benchmarks, without network.
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from mockserver import MockServer
+from S2query import S2paperAPI, S2paperWeb, PageMemo, ResponseCache, Scheduler
+
+
+@pytest.fixture
+def server():
+  server = MockServer(total=1000, ptruncated=0.5, seed=3)
+  yield server, server.start()
+  server.stop()
+
+
+def client(kind, base, path):
+  options = dict(executor="thread", cache=ResponseCache(path), scheduler=Scheduler(retries=10, backoff=0.001))
+  if kind == "api":
+    m = S2paperAPI(**options)
+    m._api = base + "/graph/v1/paper/search"
+  else:
+    m = S2paperWeb(**options)
+    m._url = base + "/api/1/search"
+  return m
+
+
+def papers(m):
+  return len(m.all) if isinstance(m, S2paperAPI) else sum(page["Page"]["N_Papers"] for page in m.all["Results"])
+
+
+# A truncated 200 is not kept in the cache, the retry goes to the server again.
+@pytest.mark.parametrize("kind", ["api", "web"])
+def test_truncated_body_is_not_cached(server, tmp_path, kind):
+  server, base = server
+  m = client(kind, base, str(tmp_path / "cache.sqlite"))
+  m.get("cache", n=500)
+  assert papers(m) == 500
+  assert m.badcalls == []
+
+  # All the pages kept are valid: the same search is answered by the cache alone.
+  requests = server.stats()["requests"]
+  m.get("cache", n=500)
+  assert papers(m) == 500
+  assert server.stats()["requests"] == requests
+  m.close()
+
+
+@pytest.mark.parametrize("kind", ["api", "web"])
+def test_truncated_body_is_not_cached_async(server, tmp_path, kind):
+  pytest.importorskip("aiohttp")
+  server, base = server
+  m = client(kind, base, str(tmp_path / "cache.sqlite"))
+  asyncio.run(m.aget("cache", n=500))
+  assert papers(m) == 500
+  assert m.badcalls == []
+  m.close()
+
+
+def ids(m):
+  return list(m.all["paperId"]) if isinstance(m, S2paperAPI) else list(m.to_frame()["paperId"])
+
+
+# The windows of a search inside the pages already parsed are answered by the memo, with the same papers.
+@pytest.mark.parametrize("kind", ["api", "web"])
+def test_memo_windows(tmp_path, kind):
+  server = MockServer(total=1234)
+  base = server.start()
+  plain = client(kind, base, str(tmp_path / "plain.sqlite"))
+  m = client(kind, base, str(tmp_path / "memo.sqlite"))
+  plain.cache = m.cache = None
+  m.memo = PageMemo()
+  m.get("memo", n=500)
+
+  for n, offset in [(100, 0), (20, 0), (250, 0), (30, 50), (130, 250), (5, 495)]:
+    window = dict(n=n, offset=offset) if kind == "api" else dict(n=n, page=offset//10 + 1)
+    plain.get("memo", **window)
+    requests = server.stats()["requests"]
+    m.get("memo", **window)
+    assert server.stats()["requests"] == requests
+    assert ids(m) == ids(plain)
+  server.stop()
@@ -0,0 +1,77 @@
+"""
+The manifest of a saved search shared by .get() and .aget(), against the local stand-in server of the benchmarks.
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from mockserver import MockServer
+from S2query import S2paperAPI, S2paperWeb, Scheduler
+
+
+@pytest.fixture
+def server():
+  server = MockServer(total=1000, p5xx=0.3, seed=5)
+  yield server, server.start()
+  server.stop()
+
+
+def client(kind, base):
+  options = dict(executor="thread", scheduler=Scheduler(retries=1, backoff=0.001))
+  if kind == "api":
+    m = S2paperAPI(**options)
+    m._api = base + "/graph/v1/paper/search"
+  else:
+    m = S2paperWeb(**options)
+    m._url = base + "/api/1/search"
+  return m
+
+
+def saved(m):
+  if isinstance(m, S2paperAPI):
+    import pandas as pd
+    return list(pd.read_csv("Data.csv")["paperId"])
+  return list(m.to_frame(m.load_jsonl("Data.jsonl"))["paperId"])
+
+
+# A search saved again by .aget() leaves its pages done, a resume after it appends nothing.
+@pytest.mark.parametrize("kind", ["api", "web"])
+def test_aget_marks_the_manifest(server, tmp_path, monkeypatch, kind):
+  pytest.importorskip("aiohttp")
+  monkeypatch.chdir(tmp_path)
+  server, base = server
+  m = client(kind, base)
+  m.get("manifest", n=1000, save=True)
+  assert m.badcalls != []
+
+  server.p5xx = 0
+  asyncio.run(m.aget("manifest", n=1000, save=True))
+  assert len(saved(m)) == 1000
+
+  requests = server.stats()["requests"]
+  m.get("manifest", n=1000, save=True, resume=True)
+  ids = saved(m)
+  assert len(ids) == len(set(ids)) == 1000
+  assert server.stats()["requests"] == requests
+  m.close()
+
+
+# A failed .aget() is resumed by .aget(resume=True), the pages missing are appended.
+@pytest.mark.parametrize("kind", ["api", "web"])
+def test_aget_resume(server, tmp_path, monkeypatch, kind):
+  pytest.importorskip("aiohttp")
+  monkeypatch.chdir(tmp_path)
+  server, base = server
+  m = client(kind, base)
+  asyncio.run(m.aget("manifest", n=1000, save=True))
+  assert m.badcalls != []
+
+  server.p5xx = 0
+  asyncio.run(m.aget("manifest", n=1000, save=True, resume=True))
+  ids = saved(m)
+  assert len(ids) == len(set(ids)) == 1000
+  m.close()